@@ -1,42 +1,64 @@
 import os
 import re
+import atexit
 import csv
-import io
-import shutil
+import hashlib
+import itertools
+import json
 import sqlite3
+import tempfile
+import threading
+import zlib
+from collections import OrderedDict
+from contextlib import contextmanager
 from datetime import datetime
 from functools import wraps
 from io import BytesIO
 
-from flask import (Flask, render_template, request, jsonify,
-                   send_file, g, session, redirect, url_for, flash)
+import click
+
+from flask import (Blueprint, Flask, render_template, request, jsonify, Response, stream_with_context,
+                   send_file, g, session, redirect, url_for, flash, abort, current_app, has_app_context)
 from werkzeug.security import generate_password_hash, check_password_hash
-import qrcode
-import qrcode.constants
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import A4, landscape
-from reportlab.lib.units import cm
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.enums import TA_CENTER
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Image as RLImage
-
-app = Flask(__name__)
-app.secret_key = os.environ.get('SECRET_KEY', 'afosi-assetqr-k3y-2025-change-in-settings')
+
+import events
+import idseq
+import importer
+import jobs
+import repository
+import scans
+import snapshots
+import storage
+import uploads
+from importer import ASSET_COLS, DATA_COLS, slugify
+from migrations import STATS_TRUTH, migrate, rebuild_stats
+from qr_service import QRCache, QRService, qr_bytes, qr_key
+from repository import asset_query, check_stats, dashboard_stats
+
+# Routes, CLI commands and teardown live on this blueprint; create_app() (at
+# the bottom) builds an app around it for a given storage backend.
+bp = Blueprint('main', __name__, cli_group=None)
 
 # ── Vercel / environment detection ────────────────────────────────────────────
 IS_VERCEL   = bool(os.environ.get('VERCEL'))
 _BASE_DIR   = os.path.dirname(os.path.abspath(__file__))
 
-# On Vercel the deployment bundle is read-only; copy DB to /tmp for write access.
-def _db_path():
+# Set when `python jobs.py` workers run alongside the web process; otherwise a
+# worker thread is started in-process on demand.
+JOBS_EXTERNAL = bool(os.environ.get('JOBS_EXTERNAL'))
+
+def default_storage():
+    """ASSETQR_DB (a path or ':memory:') and ASSETQR_DB_REPLICA, else
+    assetqr.db next to the app. On Vercel the deployment bundle is read-only,
+    so the DB is copied to /tmp for write access — on first use rather than
+    at import, so a cold start that never touches it does not pay for it."""
+    bundled = os.path.join(_BASE_DIR, 'assetqr.db')
+    replica = os.environ.get('ASSETQR_DB_REPLICA')
+    if os.environ.get('ASSETQR_DB'):
+        return storage.open_storage(os.environ['ASSETQR_DB'], replica)
     if IS_VERCEL:
-        tmp = '/tmp/assetqr.db'
-        if not os.path.exists(tmp):
-            src = os.path.join(_BASE_DIR, 'assetqr.db')
-            if os.path.exists(src):
-                shutil.copy2(src, tmp)
-        return tmp
-    return os.path.join(_BASE_DIR, 'assetqr.db')
+        return storage.open_storage('/tmp/assetqr.db', replica, seed=bundled)
+    return storage.open_storage(bundled, replica)
 
 def _qr_folder():
     if IS_VERCEL:
@@ -45,72 +67,170 @@ def _qr_folder():
         return d
     return os.path.join(_BASE_DIR, 'static', 'qrcodes')
 
-DB_PATH   = _db_path()
-QR_FOLDER = _qr_folder()
-if not IS_VERCEL:
-    os.makedirs(QR_FOLDER, exist_ok=True)
+
+class AppState:
+    """What one app instance keeps between requests, besides its storage's
+    caches: the QR render pool, the scan buffer, cached scan pages and the
+    in-process job thread."""
+
+    def __init__(self, store, qr_folder):
+        self.storage    = store
+        self.qr_folder  = qr_folder
+        self.qr         = QRService(cache=QRCache(qr_folder))
+        # Scans are buffered in memory and written in batches by a background
+        # thread (from the request itself on Vercel, where threads are frozen).
+        self.scan_log   = scans.ScanRecorder(store.ensure, background=not IS_VERCEL)
+        self.scan_pages = OrderedDict()      # asset_id -> (tag, html)
+        self.scan_lock  = threading.Lock()
+        self.job_thread = None
+
+def state():
+    # Outside an app context (scripts, benches) helpers act on the module-level app
+    return (current_app if has_app_context() else app).extensions['assetqr']
 
 
 # ── Database ──────────────────────────────────────────────────────────────────
 
 def get_db():
     if 'db' not in g:
-        # Re-resolve path each request so Vercel /tmp copy is used correctly
-        g.db = sqlite3.connect(_db_path())
-        g.db.row_factory = sqlite3.Row
+        st   = state().storage
+        g.db = st.acquire()
+        if not st.migrated:
+            # Once per storage: the bundled DB may predate the latest migrations
+            migrate(g.db)
+            st.migrated = True
     return g.db
 
-@app.teardown_appcontext
+def get_read_db():
+    """Connection for pages that only read and can trail the latest write by
+    a replica's lag (scan pages, QR images, lists, exports). The primary's
+    own connection unless the storage has a read replica."""
+    st = state().storage
+    if st.read_pool is st.pool:
+        return get_db()
+    if 'read_db' not in g:
+        g.read_db = st.acquire_read()
+    return g.read_db
+
+@bp.teardown_app_request
 def close_db(e=None):
+    st = state().storage
     db = g.pop('db', None)
     if db:
-        db.close()
+        st.release(db)
+    db = g.pop('read_db', None)
+    if db:
+        st.release_read(db)
+    snap = g.pop('snap_db', None)
+    if snap:
+        snap.close()
+
+@contextmanager
+def stream_db(snapshot=None):
+    """A connection of its own for a streamed response body, which keeps
+    reading after the view has returned; closed when the body finishes.
+    With snapshot (a file, see snapshot_file()) it reads that snapshot."""
+    st = state().storage
+    db = snapshots.open_snapshot(snapshot) if snapshot else st.acquire_read()
+    try:
+        yield db
+    finally:
+        if snapshot:
+            db.close()
+        else:
+            st.release_read(db)
 
-def init_db():
-    db = sqlite3.connect(DB_PATH)
-    db.executescript('''
-        CREATE TABLE IF NOT EXISTS assets (
-            id            INTEGER PRIMARY KEY AUTOINCREMENT,
-            asset_id      TEXT    UNIQUE NOT NULL,
-            name          TEXT    NOT NULL,
-            category      TEXT    DEFAULT '',
-            description   TEXT    DEFAULT '',
-            location      TEXT    DEFAULT '',
-            status        TEXT    DEFAULT 'active',
-            serial_number TEXT    DEFAULT '',
-            purchase_date TEXT    DEFAULT '',
-            custodian     TEXT    DEFAULT '',
-            donor         TEXT    DEFAULT '',
-            value_ksh     TEXT    DEFAULT '',
-            notes         TEXT    DEFAULT '',
-            qr_code_path  TEXT    DEFAULT '',
-            created_at    TEXT    DEFAULT (datetime('now')),
-            updated_at    TEXT    DEFAULT (datetime('now'))
-        );
-
-        CREATE TABLE IF NOT EXISTS settings (
-            key   TEXT PRIMARY KEY,
-            value TEXT NOT NULL DEFAULT ''
-        );
-
-        INSERT OR IGNORE INTO settings VALUES ('base_url',      'http://localhost:5001');
-        INSERT OR IGNORE INTO settings VALUES ('company_name',  'My Organization');
-        INSERT OR IGNORE INTO settings VALUES ('qr_color',      '#000000');
-        INSERT OR IGNORE INTO settings VALUES ('admin_username', 'admin');
-    ''')
-    # Default password: afosi2025  (change via Settings page)
-    existing_pw = db.execute("SELECT value FROM settings WHERE key='admin_password_hash'").fetchone()
-    if not existing_pw:
-        db.execute("INSERT INTO settings VALUES ('admin_password_hash', ?)",
-                   (generate_password_hash('afosi2025'),))
-    # Migration: add new columns to existing DBs that predate this schema
-    for col in ('custodian', 'donor', 'value_ksh'):
-        try:
-            db.execute(f"ALTER TABLE assets ADD COLUMN {col} TEXT DEFAULT ''")
-        except Exception:
-            pass  # column already exists
-    db.commit()
+def init_db(path=None):
+    db = sqlite3.connect(path) if path else state().storage.acquire()
+    repository.init_db(db)
+    if path:
+        db.close()
+    else:
+        state().storage.release(db)
+
+
+@bp.cli.command('check-stats')
+@click.option('--fix', is_flag=True, help='Rebuild asset_stats from the assets table.')
+def check_stats_command(fix):
+    """Verify the dashboard counters against a full recount."""
+    st = state().storage
+    db = st.acquire()
+    migrate(db)
+    bad = check_stats(db)
+    for (dim, key), (stored, actual) in sorted(bad.items()):
+        click.echo(f'{dim:9s} {key or "(blank)":30s} stored={stored} actual={actual}')
+    if bad and fix:
+        rebuild_stats(db)
+        click.echo('asset_stats rebuilt.')
+    elif not bad:
+        click.echo('asset_stats is consistent.')
+    st.release(db)
+    if bad and not fix:
+        raise SystemExit(1)
+
+
+# Hot queries and the index each must use. `flask check-plans` runs them
+# through EXPLAIN QUERY PLAN on a freshly migrated schema and fails when one
+# scans `assets`, sorts its output in a temp b-tree, or stops using its index.
+PLAN_CHECKS = [
+    ('dashboard recount',  lambda db: (STATS_TRUTH, []),                        'idx_assets_status'),
+    ('category dropdown',  lambda db: ("SELECT DISTINCT category FROM assets WHERE category!='' "
+                                       "ORDER BY category", []),                'idx_assets_category'),
+    ('list by status',     lambda db: asset_query(db, status='active', limit=201), 'idx_assets_status'),
+    ('list by category',   lambda db: asset_query(db, cat='Furniture', limit=201), 'idx_assets_category'),
+    ('list next page',     lambda db: asset_query(db, after='AFOSI-100', limit=201), 'sqlite_autoindex_assets_1'),
+    ('export by status',   lambda db: asset_query(db, status='retired'),        'idx_assets_status'),
+    ('count by category',  lambda db: asset_query(db, cat='Furniture', cols='COUNT(*)', order=None),
+                                                                                'idx_assets_category'),
+    ('by location',        lambda db: ('SELECT * FROM assets WHERE location=?', ['Store']), 'idx_assets_location'),
+    ('by custodian',       lambda db: ('SELECT * FROM assets WHERE custodian=?', ['x']),    'idx_assets_custodian'),
+    ('by donor',           lambda db: ('SELECT * FROM assets WHERE donor=?', ['x']),        'idx_assets_donor'),
+    ('asset history page', lambda db: events.history_query('AFOSI-001', '2026-01-01 00:00:00.000|9'),
+                                                                                'idx_events_asset'),
+]
+
+def plan_problems(db):
+    """Run PLAN_CHECKS against db. Returns [(label, problem, plan lines)]."""
+    bad = []
+    for label, build, index in PLAN_CHECKS:
+        sql, params = build(db)
+        plan = [r[3] for r in db.execute(f'EXPLAIN QUERY PLAN {sql}', params)]
+        text = '\n'.join(plan)
+        if index not in text:
+            bad.append((label, f'does not use {index}', plan))
+        elif 'TEMP B-TREE FOR ORDER BY' in text:
+            bad.append((label, 'sorts in a temp b-tree', plan))
+        elif re.search(r'^SCAN (a|assets)$', text, re.M):
+            bad.append((label, 'scans the assets table', plan))
+    return bad
+
+
+@bp.cli.command('snapshot')
+@click.argument('name')
+def snapshot_command(name):
+    """Freeze the register under NAME (e.g. before an audit)."""
+    st   = state().storage
+    db   = st.acquire()
+    migrate(db)
+    snap = snapshots.create(db, st.ensure(), name)
+    st.release(db)
+    click.echo(f'Snapshot {snap["id"]}: {snap["assets"]} assets, {snap["bytes"] / 1e6:.1f} MB -> {snap["file"]}')
+
+
+@bp.cli.command('check-plans')
+def check_plans_command():
+    """Fail if a hot query regressed to a table scan or lost its index."""
+    db = sqlite3.connect(':memory:')
+    migrate(db)
+    bad = plan_problems(db)
+    for label, problem, plan in bad:
+        click.echo(f'{label}: {problem}')
+        for line in plan:
+            click.echo(f'    {line}')
     db.close()
+    if bad:
+        raise SystemExit(1)
+    click.echo(f'{len(PLAN_CHECKS)} query plans OK.')
 
 
 # ── Auth ──────────────────────────────────────────────────────────────────────
@@ -119,183 +239,317 @@ def login_required(f):
     @wraps(f)
     def decorated(*args, **kwargs):
         if not session.get('logged_in'):
-            return redirect(url_for('login', next=request.path))
+            return redirect(url_for('.login', next=request.path))
         return f(*args, **kwargs)
     return decorated
 
 
-@app.route('/login', methods=['GET', 'POST'])
+@bp.route('/login', methods=['GET', 'POST'])
 def login():
     if session.get('logged_in'):
-        return redirect(url_for('dashboard'))
+        return redirect(url_for('.dashboard'))
     error = None
     if request.method == 'POST':
         username = request.form.get('username', '').strip()
         password = request.form.get('password', '')
-        db = get_db()
-        stored_user = db.execute("SELECT value FROM settings WHERE key='admin_username'").fetchone()
-        stored_hash = db.execute("SELECT value FROM settings WHERE key='admin_password_hash'").fetchone()
+        stored_user = setting('admin_username', None)
+        stored_hash = setting('admin_password_hash', None)
         if (stored_user and stored_hash
-                and username == stored_user['value']
-                and check_password_hash(stored_hash['value'], password)):
+                and username == stored_user
+                and check_password_hash(stored_hash, password)):
             session['logged_in'] = True
             session['username']  = username
-            next_url = request.args.get('next') or url_for('dashboard')
+            next_url = request.args.get('next') or url_for('.dashboard')
             return redirect(next_url)
         error = 'Invalid username or password.'
     return render_template('login.html', error=error)
 
 
-@app.route('/logout')
+@bp.route('/logout')
 def logout():
     session.clear()
-    return redirect(url_for('login'))
+    return redirect(url_for('.login'))
 
 
-@app.route('/api/change-password', methods=['POST'])
+@bp.route('/api/change-password', methods=['POST'])
 @login_required
 def api_change_password():
     d  = request.json or {}
     db = get_db()
-    stored = db.execute("SELECT value FROM settings WHERE key='admin_password_hash'").fetchone()
-    if not stored or not check_password_hash(stored['value'], d.get('current_password', '')):
+    stored = setting('admin_password_hash', None)
+    if not stored or not check_password_hash(stored, d.get('current_password', '')):
         return jsonify({'error': 'Current password is incorrect'}), 400
     new_pw = (d.get('new_password') or '').strip()
     if len(new_pw) < 6:
         return jsonify({'error': 'New password must be at least 6 characters'}), 400
-    db.execute("INSERT OR REPLACE INTO settings VALUES ('admin_password_hash', ?)",
-               (generate_password_hash(new_pw),))
+    changes = {'admin_password_hash': generate_password_hash(new_pw)}
     if d.get('new_username'):
-        db.execute("INSERT OR REPLACE INTO settings VALUES ('admin_username', ?)",
-                   (d['new_username'].strip(),))
-    db.commit()
+        changes['admin_username'] = d['new_username'].strip()
+    repository.save_settings(db, changes)
+    invalidate_settings()
     return jsonify({'success': True})
 
 
 # ── Helpers ───────────────────────────────────────────────────────────────────
 
+# Every process keeps the whole settings table in memory (on the storage,
+# so apps over different databases never share it), tagged with the
+# settings_version counter that triggers bump on any write (migrations.py).
+# A request reads the counter once and reloads only when it has moved, so
+# a write in one worker process reaches the others on their next request.
+# Settings are read from the primary: a request that just saved them must
+# see its own write, which a lagging replica would not show.
+
+def all_settings():
+    if '_settings' not in g:
+        st, db = state().storage, get_db()
+        ver    = repository.settings_version(db)
+        if ver != st.settings[0]:
+            st.settings = (ver, repository.all_settings(db))
+        g._settings_version, g._settings = st.settings
+    return g._settings
+
+def settings_version():
+    all_settings()
+    return g._settings_version
+
+def invalidate_settings():
+    """Drop the cached copy after a write in this request."""
+    state().storage.settings = (None, {})
+    g.pop('_settings', None)
+    g.pop('_settings_version', None)
+
 def setting(key, default=''):
-    # BASE_URL env var overrides the DB value (needed for Vercel deployments)
-    if key == 'base_url' and os.environ.get('BASE_URL'):
-        return os.environ['BASE_URL'].rstrip('/')
-    row = get_db().execute('SELECT value FROM settings WHERE key=?', (key,)).fetchone()
-    return row['value'] if row else default
-
-def slugify(text):
-    text = (text or '').lower().strip()
-    text = re.sub(r'[^\w\s-]', '', text)
-    text = re.sub(r'[\s_]+', '-', text)
-    return text[:30].strip('-')
+    if key == 'base_url':
+        return repository.base_url(get_db(), all_settings().get(key) or default)
+    return all_settings().get(key, default)
+
+def id_pattern(db):
+    # Read from db itself: bulk callers (import scripts, benches) pass their own
+    return repository.get_setting(db, 'id_pattern') or idseq.DEFAULT_PATTERN
 
 def next_asset_id(name, db):
-    base = slugify(name) or 'asset'
-    n = db.execute('SELECT COUNT(*) FROM assets').fetchone()[0] + 1
-    cand = f'{base}-{n:04d}'
-    while db.execute('SELECT 1 FROM assets WHERE asset_id=?', (cand,)).fetchone():
-        n += 1
-        cand = f'{base}-{n:04d}'
-    return cand
-
-def make_qr(asset_id):
-    base_url  = setting('base_url', 'http://localhost:5001')
-    qr_color  = setting('qr_color', '#000000')
-    url       = f'{base_url}/asset/{asset_id}'
-    qr = qrcode.QRCode(
-        error_correction=qrcode.constants.ERROR_CORRECT_H,  # 30% damage tolerance
-        box_size=10,
-        border=4,
-    )
-    qr.add_data(url)
-    qr.make(fit=True)
-    img  = qr.make_image(fill_color=qr_color, back_color='white')
-    folder = _qr_folder()
-    path   = os.path.join(folder, f'qr_{asset_id}.png')
-    img.save(path)
-    return path
+    # Sequence-backed, so two concurrent creates never get the same ID
+    while True:
+        cand = importer.allocate_ids(db, [slugify(name) or 'asset'], id_pattern(db))[0]
+        if not repository.asset_exists(db, cand):
+            return cand
+
+def qr_path(asset_id):
+    return repository.qr_path(state().qr_folder, asset_id)
+
+def queue_qr(asset_ids):
+    """Hand QR rendering for asset_ids to the pool; returns the QRBatch."""
+    base_url = setting('base_url', 'http://localhost:5001')
+    qr_color = setting('qr_color', '#000000')
+    return state().qr.submit((f'{base_url}/asset/{a}', qr_path(a), qr_color) for a in asset_ids)
+
+def qr_version():
+    """Short tag of the current QR settings; /qr/ links carry it as ?v= so
+    CDN copies can be cached for good and still change with the settings."""
+    base_url = setting('base_url', 'http://localhost:5001')
+    qr_color = setting('qr_color', '#000000')
+    return qr_key(base_url, qr_color)[:10]
+
+def start_job(kind, params, supersede=True):
+    """Persist a background job and make sure something will run it."""
+    s      = state()
+    job_id = jobs.enqueue(get_db(), kind, params, supersede)
+    # Vercel has no long-lived process: the job advances while it is polled.
+    if not (IS_VERCEL or JOBS_EXTERNAL) and (s.job_thread is None or not s.job_thread.is_alive()):
+        s.job_thread = jobs.start_thread(s.storage.ensure(), s.qr)
+    return job_id
+
+
+# ── Bulk import engine ────────────────────────────────────────────────────────
+# The engine lives in importer.py so import_register.py can share it.
+
+def bulk_insert(db, items):
+    return importer.bulk_insert(db, items, qr_path, id_pattern(db))
+
+def bulk_upsert(db, items):
+    res = importer.bulk_upsert(db, items, qr_path, id_pattern(db))
+    forget_scan_page(*res['updated'])
+    return res
 
 
 # ── Page routes ───────────────────────────────────────────────────────────────
 
-@app.route('/')
+@bp.route('/')
 @login_required
 def dashboard():
-    db = get_db()
-    stats = {
-        'total':       db.execute('SELECT COUNT(*) FROM assets').fetchone()[0],
-        'active':      db.execute("SELECT COUNT(*) FROM assets WHERE status='active'").fetchone()[0],
-        'maintenance': db.execute("SELECT COUNT(*) FROM assets WHERE status='maintenance'").fetchone()[0],
-        'retired':     db.execute("SELECT COUNT(*) FROM assets WHERE status='retired'").fetchone()[0],
-        'categories':  db.execute("SELECT COUNT(DISTINCT category) FROM assets WHERE category!=''").fetchone()[0],
-    }
-    by_cat = db.execute(
-        "SELECT category, COUNT(*) cnt FROM assets WHERE category!='' GROUP BY category ORDER BY cnt DESC LIMIT 8"
-    ).fetchall()
-    recent = db.execute('SELECT * FROM assets ORDER BY asset_id LIMIT 10').fetchall()
+    db = get_read_db()
+    stats, by_cat = dashboard_stats(db)
+    recent = repository.first_assets(db, 10)
     return render_template('index.html', stats=stats, by_cat=by_cat, recent=recent)
 
 
-@app.route('/assets')
+ASSETS_PAGE = 200        # rows per page on /assets
+
+@bp.route('/assets')
 @login_required
 def assets_page():
-    db  = get_db()
+    db  = get_read_db()
     q   = request.args.get('q', '')
     cat = request.args.get('cat', '')
     st  = request.args.get('status', '')
 
-    sql, params = 'SELECT * FROM assets WHERE 1=1', []
-    if q:
-        sql += ' AND (name LIKE ? OR asset_id LIKE ? OR location LIKE ? OR description LIKE ? OR serial_number LIKE ?)'
-        params += [f'%{q}%'] * 5
-    if cat:
-        sql += ' AND category=?'; params.append(cat)
-    if st:
-        sql += ' AND status=?'; params.append(st)
-    sql += ' ORDER BY asset_id'          # AFOSI-001, 002, 003 ...
+    # Lists page by keyset on asset_id; search hits are ranked, so they page by offset
+    after = '' if q else request.args.get('after', '')
+    page  = max(request.args.get('page', 1, type=int), 1) if q else 1
 
-    assets = db.execute(sql, params).fetchall()
-    cats   = [r[0] for r in db.execute(
-        "SELECT DISTINCT category FROM assets WHERE category!='' ORDER BY category"
-    ).fetchall()]
-    return render_template('assets.html', assets=assets, cats=cats, q=q, cat=cat, status=st)
+    assets = repository.find_assets(db, q=q, cat=cat, status=st, order='rank', after=after,
+                                    limit=ASSETS_PAGE + 1, offset=(page - 1) * ASSETS_PAGE)
+    more   = len(assets) > ASSETS_PAGE
+    assets = assets[:ASSETS_PAGE]
+    total  = repository.count_assets(db, q, cat, st)
+    cats   = repository.categories(db)
+    next_after = assets[-1]['asset_id'] if more and not q else ''
+    return render_template('assets.html', assets=assets, cats=cats, q=q, cat=cat, status=st,
+                           qr_v=qr_version(), total=total, after=after, next_after=next_after,
+                           page=page, more=more)
 
 
 # ── Public: QR scan target (no login needed) ──────────────────────────────────
-@app.route('/asset/<asset_id>')
-def asset_detail(asset_id):
-    db    = get_db()
-    asset = db.execute('SELECT * FROM assets WHERE asset_id=?', (asset_id,)).fetchone()
+# Rendered pages are kept per asset, tagged with the asset's version (see
+# repository.asset_version) and the settings version (company name, base_url
+# and qr_color all show on the page). A scan costs one indexed lookup; phones
+# that already have the page get a 304 without it being rendered at all.
+# SCAN_CACHE_SIZE=0 disables it.
+
+SCAN_CACHE_SIZE = int(os.environ.get('SCAN_CACHE_SIZE', 2048))
+
+def _scan_rev():
+    # Content hash of the page's template (standalone: no extends/includes).
+    # Not its mtime, which checkouts and deploys reset.
+    with open(os.path.join(_BASE_DIR, 'templates', 'asset_detail.html'), 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()[:10]
+
+_SCAN_REV       = _scan_rev()
+
+def forget_scan_page(*asset_ids):
+    """Evict cached scan pages after the assets were edited or deleted."""
+    s = state()
+    with s.scan_lock:
+        for a in asset_ids:
+            s.scan_pages.pop(a, None)
+
+def _render_scan_page(db, asset_id):
+    asset = repository.asset(db, asset_id)
     if not asset:
-        return render_template('404.html', msg=f'Asset "{asset_id}" not found'), 404
+        return None
     company  = setting('company_name', 'Asset Registry')
     base_url = setting('base_url', 'http://localhost:5001')
     qr_url   = f'{base_url}/asset/{asset_id}'
-    return render_template('asset_detail.html', asset=asset, company=company, qr_url=qr_url)
-
-
-@app.route('/import')
+    qr_v     = qr_key(base_url, setting('qr_color', '#000000'))[:10]
+    return render_template('asset_detail.html', asset=asset, company=company, qr_url=qr_url,
+                           qr_v=qr_v)
+
+def _cached_scan_page(db, asset_id, tag):
+    s = state()
+    with s.scan_lock:
+        hit = s.scan_pages.get(asset_id)
+        if hit and hit[0] == tag:
+            s.scan_pages.move_to_end(asset_id)
+            return hit[1]
+    html = _render_scan_page(db, asset_id)
+    if html is not None and SCAN_CACHE_SIZE:
+        with s.scan_lock:
+            s.scan_pages[asset_id] = (tag, html)
+            s.scan_pages.move_to_end(asset_id)
+            while len(s.scan_pages) > SCAN_CACHE_SIZE:
+                s.scan_pages.popitem(last=False)
+    return html
+
+@bp.route('/asset/<asset_id>')
+def asset_detail(asset_id):
+    db  = get_read_db()
+    ver = repository.asset_version(db, asset_id)
+    if ver is None:
+        return render_template('404.html', msg=f'Asset "{asset_id}" not found'), 404
+    state().scan_log.record(asset_id, request.access_route[0] if request.access_route else '',
+                            request.user_agent.string)
+    tag  = f'{ver}.{settings_version()}.{_SCAN_REV}'
+    etag = hashlib.sha1(f'{asset_id}\0{tag}'.encode()).hexdigest()[:20]
+    if request.if_none_match.contains(etag):
+        resp = Response(status=304)
+    else:
+        html = _cached_scan_page(db, asset_id, tag)
+        if html is None:                                   # deleted meanwhile
+            return render_template('404.html', msg=f'Asset "{asset_id}" not found'), 404
+        resp = Response(html, mimetype='text/html')
+    resp.set_etag(etag)
+    resp.headers['Cache-Control'] = 'public, no-cache'    # store, but revalidate each scan
+    return resp
+
+
+# ── Public: on-demand QR images (no filesystem state) ─────────────────────────
+@bp.route('/qr/<asset_id>.<any(png, svg):fmt>')
+def qr_image(asset_id, fmt):
+    if not repository.asset_exists(get_read_db(), asset_id):
+        return jsonify({'error': 'Not found'}), 404
+    base_url = setting('base_url', 'http://localhost:5001')
+    qr_color = setting('qr_color', '#000000')
+    url      = f'{base_url}/asset/{asset_id}'
+    etag     = f'{qr_key(url, qr_color)}.{fmt}'
+
+    if request.args.get('v') == qr_key(base_url, qr_color)[:10]:
+        cache = 'public, max-age=31536000, immutable'
+    else:
+        cache = 'public, max-age=300, s-maxage=86400, stale-while-revalidate=604800'
+    if request.if_none_match.contains(etag):
+        resp = Response(status=304)
+    else:
+        resp = Response(qr_bytes(url, qr_color, fmt),
+                        mimetype='image/svg+xml' if fmt == 'svg' else 'image/png')
+    resp.set_etag(etag)
+    resp.headers['Cache-Control'] = cache
+    return resp
+
+
+@bp.route('/import')
 @login_required
 def import_page():
     return render_template('import.html')
 
 
-@app.route('/settings')
+@bp.route('/settings')
 @login_required
 def settings_page():
-    db = get_db()
-    s  = {r['key']: r['value'] for r in db.execute('SELECT * FROM settings').fetchall()}
-    return render_template('settings.html', s=s)
+    import labels
+    return render_template('settings.html', s=all_settings(), sheets=labels.SHEETS,
+                           default_sheet=labels.DEFAULT_SHEET,
+                           snaps=snapshots.all_snapshots(get_db()))
 
 
 # ── API ───────────────────────────────────────────────────────────────────────
 
-@app.route('/api/assets', methods=['GET'])
+LIST_FIELDS    = ('id',) + ASSET_COLS + ('created_at', 'updated_at')
+DEFAULT_FIELDS = ('id', 'asset_id', 'name', 'category', 'location', 'status', 'custodian', 'updated_at')
+API_MAX_LIMIT  = 1000
+
+@bp.route('/api/assets', methods=['GET'])
 @login_required
 def api_list():
-    db = get_db()
-    return jsonify([dict(r) for r in db.execute('SELECT * FROM assets ORDER BY asset_id').fetchall()])
-
-
-@app.route('/api/assets', methods=['POST'])
+    """Keyset-paged list: ?after=<asset_id>&limit=&fields=a,b|*, plus the
+    q/cat/status/ids filters of the exports. Follow `next` for the next page."""
+    db    = get_read_db()
+    limit = request.args.get('limit', '100')
+    limit = max(1, min(int(limit) if limit.isdigit() else 100, API_MAX_LIMIT))
+    f_arg = request.args.get('fields', '')
+    fields = LIST_FIELDS if f_arg == '*' else tuple(f for f in f_arg.split(',') if f) or DEFAULT_FIELDS
+    bad = [f for f in fields if f not in LIST_FIELDS]
+    if bad:
+        return jsonify({'error': f'Unknown field(s): {", ".join(bad)}'}), 400
+
+    cols = ', '.join(f'a.{f}' for f in dict.fromkeys(fields + ('asset_id',)))
+    rows = repository.find_assets(db, cols=cols, after=request.args.get('after'),
+                                  limit=limit + 1, **_asset_args())
+    nxt  = rows[limit - 1]['asset_id'] if len(rows) > limit else None
+    return jsonify({'items': [{f: r[f] for f in fields} for r in rows[:limit]], 'next': nxt})
+
+
+@bp.route('/api/assets', methods=['POST'])
 @login_required
 def api_create():
     d  = request.json or {}
@@ -305,331 +559,543 @@ def api_create():
         return jsonify({'error': 'Name is required'}), 400
 
     asset_id = (d.get('asset_id') or '').strip() or next_asset_id(name, db)
-    if db.execute('SELECT 1 FROM assets WHERE asset_id=?', (asset_id,)).fetchone():
+    if repository.asset_exists(db, asset_id):
         return jsonify({'error': f'Asset ID "{asset_id}" already exists'}), 409
 
-    db.execute('''
-        INSERT INTO assets (asset_id, name, category, description, location,
-                            status, serial_number, purchase_date,
-                            custodian, donor, value_ksh, notes)
-        VALUES (?,?,?,?,?,?,?,?,?,?,?,?)
-    ''', (asset_id, name,
-          d.get('category',''), d.get('description',''), d.get('location',''),
-          d.get('status','active'), d.get('serial_number',''),
-          d.get('purchase_date',''), d.get('custodian',''),
-          d.get('donor',''), d.get('value_ksh',''), d.get('notes','')))
-    db.commit()
-
-    qp = make_qr(asset_id)
-    db.execute('UPDATE assets SET qr_code_path=? WHERE asset_id=?', (qp, asset_id))
-    db.commit()
-    return jsonify(dict(db.execute('SELECT * FROM assets WHERE asset_id=?', (asset_id,)).fetchone())), 201
-
-
-@app.route('/api/assets/bulk', methods=['POST'])
-@login_required
-def api_bulk():
-    items = (request.json or {}).get('items', [])
-    db    = get_db()
-    ok, fail, errors = 0, 0, []
-
-    for item in items:
-        name = (item.get('name') or '').strip()
-        if not name:
-            fail += 1; errors.append('Blank name skipped'); continue
+    repository.insert_asset(db, asset_id, dict(d, name=name), qr_path(asset_id))
+    queue_qr([asset_id])
+    return jsonify(dict(repository.asset(db, asset_id))), 201
 
-        asset_id = (item.get('asset_id') or '').strip() or next_asset_id(name, db)
-        while db.execute('SELECT 1 FROM assets WHERE asset_id=?', (asset_id,)).fetchone():
-            asset_id += '-x'
 
+@bp.route('/api/assets/bulk', methods=['POST'])
+@login_required
+def api_bulk():
+    """{"items": [...]} creates assets. With "mode": "upsert", items are
+    matched on asset_id: new ones are inserted, changed ones updated and
+    identical ones skipped."""
+    d  = request.json or {}
+    db = get_db()
+    if d.get('mode') == 'upsert':
+        res   = bulk_upsert(db, d.get('items', []))
+        batch = queue_qr(res['inserted'])      # the code encodes only the asset URL
+        return jsonify({'success': len(res['inserted']) + len(res['updated']),
+                        'inserted': len(res['inserted']), 'updated': len(res['updated']),
+                        'unchanged': res['unchanged'], 'failed': res['failed'],
+                        'errors': res['errors'], 'qr_batch': batch.id})
+    done, fail, errors = bulk_insert(db, d.get('items', []))
+    batch = queue_qr(done)
+    return jsonify({'success': len(done), 'failed': fail, 'errors': errors,
+                    'qr_batch': batch.id})
+
+
+UPLOAD_CHUNK = 1000          # rows validated and inserted per transaction
+MAX_ERRORS   = 200           # per-row messages returned; the count is always exact
+
+@bp.route('/api/assets/upload', methods=['POST'])
+@login_required
+def api_upload():
+    """Import a CSV/TXT/XLSX register sent as multipart field `file`
+    (mode=upsert to update by asset_id, as on /api/assets/bulk).
+    The file is read row by row and written UPLOAD_CHUNK rows at a time. The
+    response is NDJSON: a {"done", "failed"} line per chunk, then a summary
+    line shaped like /api/assets/bulk's (with qr_batches, one per chunk)."""
+    f      = request.files.get('file')
+    upsert = request.form.get('mode') == 'upsert'
+    if not f or not f.filename:
+        return jsonify({'error': 'file is required'}), 400
+    # The upload is closed with the request, before the body below runs
+    src = tempfile.TemporaryFile()
+    f.save(src)
+    src.seek(0)
+
+    def body():
+        db = get_db()
+        ok, failed, errors, batches = 0, 0, [], []
+        counts = {'inserted': 0, 'updated': 0, 'unchanged': 0}
         try:
-            db.execute('''
-                INSERT INTO assets (asset_id, name, category, description, location,
-                                    status, serial_number, purchase_date,
-                                    custodian, donor, value_ksh, notes)
-                VALUES (?,?,?,?,?,?,?,?,?,?,?,?)
-            ''', (asset_id, name,
-                  item.get('category',''), item.get('description',''), item.get('location',''),
-                  item.get('status','active'), item.get('serial_number',''),
-                  item.get('purchase_date',''), item.get('custodian',''),
-                  item.get('donor',''), item.get('value_ksh',''), item.get('notes','')))
-            db.commit()
-            qp = make_qr(asset_id)
-            db.execute('UPDATE assets SET qr_code_path=? WHERE asset_id=?', (qp, asset_id))
-            db.commit()
-            ok += 1
-        except Exception as ex:
-            fail += 1; errors.append(f'{name}: {ex}')
-
-    return jsonify({'success': ok, 'failed': fail, 'errors': errors})
-
-
-@app.route('/api/assets/<int:aid>', methods=['GET'])
+            rows = uploads.iter_items(src, f.filename)
+            while chunk := list(itertools.islice(rows, UPLOAD_CHUNK)):
+                if upsert:
+                    res  = bulk_upsert(db, chunk)
+                    done = res['inserted']
+                    fail, errs = res['failed'], res['errors']
+                    for k in counts:
+                        counts[k] += res[k] if k == 'unchanged' else len(res[k])
+                    ok += len(res['updated'])
+                else:
+                    done, fail, errs = bulk_insert(db, chunk)
+                ok     += len(done)
+                failed += fail
+                errors += errs[:MAX_ERRORS - len(errors)]
+                batches.append(queue_qr(done).id)
+                yield json.dumps({'done': ok, 'failed': failed}) + '\n'
+        except uploads.READ_ERRORS as ex:
+            failed += 1
+            errors.append(f'{f.filename}: could not be read ({ex})')
+        finally:
+            src.close()
+        summary = {'success': ok, 'failed': failed, 'errors': errors, 'qr_batches': batches}
+        yield json.dumps(summary | counts if upsert else summary) + '\n'
+
+    return Response(stream_with_context(body()), mimetype='application/x-ndjson')
+
+
+@bp.route('/api/assets/<int:aid>', methods=['GET'])
 @login_required
 def api_get(aid):
-    db  = get_db()
-    row = db.execute('SELECT * FROM assets WHERE id=?', (aid,)).fetchone()
+    row = repository.asset_by_pk(get_db(), aid)
     if not row:
         return jsonify({'error': 'Not found'}), 404
     return jsonify(dict(row))
 
 
-@app.route('/api/assets/<int:aid>', methods=['PUT'])
+@bp.route('/api/assets/<int:aid>', methods=['PUT'])
 @login_required
 def api_update(aid):
     d   = request.json or {}
     db  = get_db()
-    row = db.execute('SELECT * FROM assets WHERE id=?', (aid,)).fetchone()
+    row = repository.asset_by_pk(db, aid)
     if not row:
         return jsonify({'error': 'Not found'}), 404
 
-    db.execute('''
-        UPDATE assets SET name=?, category=?, description=?, location=?,
-            status=?, serial_number=?, purchase_date=?,
-            custodian=?, donor=?, value_ksh=?, notes=?,
-            updated_at=datetime('now')
-        WHERE id=?
-    ''', (d.get('name', row['name']), d.get('category', row['category']),
-          d.get('description', row['description']), d.get('location', row['location']),
-          d.get('status', row['status']), d.get('serial_number', row['serial_number']),
-          d.get('purchase_date', row['purchase_date']),
-          d.get('custodian', row['custodian']), d.get('donor', row['donor']),
-          d.get('value_ksh', row['value_ksh']), d.get('notes', row['notes']),
-          aid))
-    db.commit()
-    return jsonify(dict(db.execute('SELECT * FROM assets WHERE id=?', (aid,)).fetchone()))
-
-
-@app.route('/api/assets/<int:aid>', methods=['DELETE'])
+    repository.update_asset(db, row, d)
+    forget_scan_page(row['asset_id'])
+    return jsonify(dict(repository.asset_by_pk(db, aid)))
+
+
+@bp.route('/api/assets/<int:aid>', methods=['DELETE'])
 @login_required
 def api_delete(aid):
     db  = get_db()
-    row = db.execute('SELECT * FROM assets WHERE id=?', (aid,)).fetchone()
+    row = repository.asset_by_pk(db, aid)
     if not row:
         return jsonify({'error': 'Not found'}), 404
-    if row['qr_code_path'] and os.path.exists(row['qr_code_path']):
-        try:
-            os.remove(row['qr_code_path'])
-        except Exception:
-            pass
-    db.execute('DELETE FROM assets WHERE id=?', (aid,))
-    db.commit()
+    repository.delete_asset(db, row)
+    forget_scan_page(row['asset_id'])
     return jsonify({'success': True})
 
 
-@app.route('/api/assets/<int:aid>/regen-qr', methods=['POST'])
+BULK_FIELDS   = tuple(c for c in DATA_COLS if c != 'name')   # settable on many assets at once
+STATUSES      = ('active', 'maintenance', 'retired')
+BULK_ID_CHUNK = 10_000       # ids per IN (...), under SQLite's variable limit
+
+def _bulk_selection(d):
+    """asset_query() kwargs for each slice of a bulk request's targets:
+    {"ids": [...]} or {"filter": {"q", "cat", "status"}} (at least one
+    filter value, or {"filter": {"all": true}} for every asset). None if
+    neither is given or they have the wrong shape."""
+    if d.get('ids') is not None:
+        if not isinstance(d['ids'], list):
+            return None
+        ids = [int(i) for i in d['ids'] if str(i).strip().isdigit()]
+        return [{'ids': ids[i:i + BULK_ID_CHUNK]} for i in range(0, len(ids), BULK_ID_CHUNK)]
+    f = d.get('filter') or {}
+    if not isinstance(f, dict):
+        return None
+    args = {k: f.get(k) or '' for k in ('q', 'cat', 'status')}
+    if any(args.values()) or f.get('all') is True:
+        return [args]
+    return None
+
+@bp.route('/api/assets/bulk-delete', methods=['POST'])
+@login_required
+def api_bulk_delete():
+    """Delete the selected assets in one transaction; their QR files are
+    removed by a background job."""
+    d     = request.json or {}
+    parts = _bulk_selection(d)
+    if parts is None:
+        return jsonify({'error': 'ids (a list) or a filter (an object) is required'}), 400
+    gone  = repository.delete_matching(get_db(), parts)
+    forget_scan_page(*(r['asset_id'] for r in gone))
+    paths = [r['qr_code_path'] for r in gone if r['qr_code_path']]
+    job   = start_job('remove_qr', {'paths': paths}, supersede=False) if paths else None
+    return jsonify({'success': True, 'deleted': len(gone), 'job': job})
+
+
+@bp.route('/api/assets/bulk-update', methods=['POST'])
+@login_required
+def api_bulk_update():
+    """{"set": {"status": "retired", ...}} on the selected assets, in one
+    transaction. Values are strings; null clears a field. Assets that
+    already hold those values are not touched."""
+    d      = request.json or {}
+    parts  = _bulk_selection(d)
+    if parts is None:
+        return jsonify({'error': 'ids (a list) or a filter (an object) is required'}), 400
+    given  = d.get('set') if isinstance(d.get('set'), dict) else {}
+    bad    = [k for k, v in given.items() if k in BULK_FIELDS and not isinstance(v, (str, type(None)))]
+    if bad:
+        return jsonify({'error': f'set values must be strings or null: {", ".join(bad)}'}), 400
+    fields = {k: (v or '').strip() for k, v in given.items() if k in BULK_FIELDS}
+    if not fields:
+        return jsonify({'error': f'set one of: {", ".join(BULK_FIELDS)}'}), 400
+    if 'status' in fields and fields['status'] not in STATUSES:
+        return jsonify({'error': f'Unknown status "{fields["status"]}"'}), 400
+    changed = repository.update_matching(get_db(), parts, fields)
+    forget_scan_page(*(r['asset_id'] for r in changed))
+    return jsonify({'success': True, 'updated': len(changed), 'ids': [r['id'] for r in changed]})
+
+
+@bp.route('/api/assets/<int:aid>/scans', methods=['GET'])
+@login_required
+def api_asset_scans(aid):
+    """Scan history, newest first. ?before=<id>&limit=N pages back; ?days=N
+    adds the per-day counts for that window."""
+    db  = get_db()
+    row = repository.asset_by_pk(db, aid)
+    if not row:
+        return jsonify({'error': 'Not found'}), 404
+    state().scan_log.flush()                                   # include scans still in memory
+    limit = min(max(request.args.get('limit', 50, type=int), 1), API_MAX_LIMIT)
+    items = [dict(r) for r in scans.history(db, row['asset_id'],
+                                            request.args.get('before', type=int), limit)]
+    out = {'items': items, 'next': items[-1]['id'] if len(items) == limit else None}
+    if request.args.get('days'):
+        out['daily'] = [{'day': r['day'], 'scans': r['scans']} for r in
+                        scans.daily_counts(db, row['asset_id'], request.args.get('days', type=int))]
+    return jsonify(out)
+
+
+@bp.route('/api/history/<path:asset_id>', methods=['GET'])
+@login_required
+def api_asset_history(asset_id):
+    """Change history of an asset (deleted ones included), newest first:
+    {"items": [{"id", "ts", "kind", "changes": {column: [old, new]}}],
+    "next": cursor}. Pass ?before=<next>&limit=N for the following page."""
+    limit = min(max(request.args.get('limit', 50, type=int), 1), API_MAX_LIMIT)
+    try:
+        items, nxt = events.history(get_db(), asset_id, request.args.get('before'), limit)
+    except ValueError:
+        return jsonify({'error': 'bad cursor'}), 400
+    return jsonify({'items': items, 'next': nxt})
+
+
+@bp.route('/api/snapshots', methods=['GET'])
+@login_required
+def api_snapshots():
+    return jsonify([dict(s) for s in snapshots.all_snapshots(get_db())])
+
+
+@bp.route('/api/snapshots', methods=['POST'])
+@login_required
+def api_snapshot_create():
+    """{"name": "31.08.2025 audit"} freezes the register as it is now."""
+    name = ((request.json or {}).get('name') or '').strip()
+    if not name:
+        return jsonify({'error': 'Name is required'}), 400
+    st = state().storage
+    if st.kind == 'memory':
+        return jsonify({'error': 'Snapshots need a database file'}), 400
+    return jsonify(dict(snapshots.create(get_db(), st.ensure(), name))), 201
+
+
+@bp.route('/api/snapshots/<int:sid>', methods=['DELETE'])
+@login_required
+def api_snapshot_delete(sid):
+    if not snapshots.delete(get_db(), state().storage.path, sid):
+        return jsonify({'error': 'Not found'}), 404
+    return jsonify({'success': True})
+
+
+@bp.route('/api/snapshots/<int:sid>/diff', methods=['GET'])
+@login_required
+def api_snapshot_diff(sid):
+    """What moved since the snapshot: {"added", "removed", "changed"}."""
+    db_path = state().storage.path
+    snap    = snapshots.get(get_db(), sid)
+    path    = snap and snapshots.path_of(db_path, snap)
+    if not snap or not os.path.exists(path):
+        return jsonify({'error': 'Not found'}), 404
+    out = snapshots.diff(db_path, path)
+    return jsonify({'snapshot': dict(snap), **out})
+
+
+@bp.route('/api/scans/daily', methods=['GET'])
+@login_required
+def api_scans_daily():
+    """Scans per asset per day over the last ?days=N (default 30) days."""
+    scan_log = state().scan_log
+    scan_log.flush()
+    days = min(max(request.args.get('days', 30, type=int), 1), 366)
+    return jsonify({'days': days, 'buffer': scan_log.stats(),
+                    'items': [dict(r) for r in scans.daily_counts(get_db(), days=days)]})
+
+
+@bp.route('/api/assets/<int:aid>/regen-qr', methods=['POST'])
 @login_required
 def api_regen_qr(aid):
     db  = get_db()
-    row = db.execute('SELECT * FROM assets WHERE id=?', (aid,)).fetchone()
+    row = repository.asset_by_pk(db, aid)
     if not row:
         return jsonify({'error': 'Not found'}), 404
-    qp = make_qr(row['asset_id'])
-    db.execute('UPDATE assets SET qr_code_path=? WHERE id=?', (qp, aid))
-    db.commit()
-    return jsonify({'success': True, 'path': f'/static/qrcodes/qr_{row["asset_id"]}.png'})
+    batch = queue_qr([row['asset_id']])
+    repository.set_qr_paths(db, [(qr_path(row['asset_id']), row['asset_id'])])
+    return jsonify({'success': True, 'path': url_for('.qr_image', asset_id=row['asset_id'], fmt='png'),
+                    'qr_batch': batch.id})
 
 
-@app.route('/api/settings', methods=['POST'])
+@bp.route('/api/settings', methods=['POST'])
 @login_required
 def api_settings():
     d  = request.json or {}
     db = get_db()
-    for k, v in d.items():
-        db.execute('INSERT OR REPLACE INTO settings VALUES (?,?)', (k, v))
-    db.commit()
-    if 'base_url' in d or 'qr_color' in d:
-        for r in db.execute('SELECT asset_id FROM assets').fetchall():
-            make_qr(r['asset_id'])
+    if d.get('id_pattern'):
+        p = d['id_pattern']
+        if not idseq.is_pattern(p):
+            return jsonify({'error': 'ID pattern must contain {n}, e.g. AFOSI-{n:03d}'}), 400
+        try:
+            # The regex only finds {n...}; its format spec must also work on a number
+            idseq.format_id(idseq.sequence_key('x', p), 1)
+        except ValueError as e:
+            return jsonify({'error': f'Invalid ID pattern "{p}": {e}'}), 400
+    # The settings page posts every field; only a change to what the codes
+    # encode (as resolved, BASE_URL override included) needs a regen
+    qr_was = (setting('base_url', 'http://localhost:5001'), setting('qr_color', '#000000'))
+    repository.save_settings(db, d)
+    invalidate_settings()
+    qr_now = (setting('base_url', 'http://localhost:5001'), setting('qr_color', '#000000'))
+    if qr_now != qr_was:
+        job_id = start_job('regen_qr', {
+            'base_url': qr_now[0],
+            'qr_color': qr_now[1],
+            'folder':   state().qr_folder,
+        })
+        return jsonify({'success': True, 'job': job_id})
     return jsonify({'success': True})
 
 
+@bp.route('/api/jobs/<int:job_id>', methods=['GET'])
+@login_required
+def api_job_status(job_id):
+    db = get_db()
+    jobs.init_jobs(db)
+    if IS_VERCEL:
+        job = jobs.claim(db, 'poll', job_id)
+        if job:
+            jobs.step(db, job, 'poll', state().qr)
+    job = jobs.get_job(db, job_id)
+    if not job:
+        return jsonify({'error': 'Not found'}), 404
+    job.pop('params', None)
+    return jsonify(job)
+
+
+@bp.route('/api/qr-batches', methods=['POST'])
+@login_required
+def api_qr_batch():
+    ids = [str(a).strip() for a in (request.json or {}).get('asset_ids', []) if str(a).strip()]
+    if not ids:
+        return jsonify({'error': 'asset_ids is required'}), 400
+    found   = repository.existing_asset_ids(get_db(), ids)
+    batch   = queue_qr(sorted(found))
+    missing = sorted(set(ids) - found)
+    return jsonify({**batch.as_dict(), 'missing': missing}), 202
+
+
+@bp.route('/api/qr-batches/<batch_id>', methods=['GET'])
+@login_required
+def api_qr_batch_status(batch_id):
+    batch = state().qr.get(batch_id)
+    if not batch:
+        return jsonify({'error': 'Not found'}), 404
+    return jsonify(batch.as_dict())
+
+
+@bp.route('/api/qr-cache', methods=['GET'])
+@login_required
+def api_qr_cache():
+    return jsonify(state().qr.cache.stats())
+
+
 # ── Exports ───────────────────────────────────────────────────────────────────
 
-def _query_assets(db):
+def _asset_args():
+    """The export filters in the query string, as asset_query() kwargs."""
+    args  = {'q': request.args.get('q', ''), 'cat': request.args.get('cat', ''),
+             'status': request.args.get('status', '')}
     ids_p = request.args.get('ids', '')
-    q     = request.args.get('q', '')
-    cat   = request.args.get('cat', '')
-    st    = request.args.get('status', '')
-
     if ids_p:
-        id_list = [int(x) for x in ids_p.split(',') if x.strip().isdigit()]
-        ph = ','.join('?'*len(id_list))
-        return db.execute(f'SELECT * FROM assets WHERE id IN ({ph}) ORDER BY asset_id', id_list).fetchall()
+        args['ids'] = [int(x) for x in ids_p.split(',') if x.strip().isdigit()]
+    return args
+
+def snapshot_file():
+    """File of the ?snapshot=<id> an export reads from, None for the live
+    database. An unknown id is a 404."""
+    sid = request.args.get('snapshot', type=int)
+    if not sid:
+        return None
+    snap = snapshots.get(get_db(), sid)
+    path = snap and snapshots.path_of(state().storage.path, snap)
+    if not path or not os.path.exists(path):
+        abort(404)
+    return path
+
+def export_db():
+    """Where the exports read assets from: the live database, or with
+    ?snapshot=<id> that snapshot, opened read-only."""
+    path = snapshot_file()
+    if not path:
+        return get_read_db()
+    if 'snap_db' not in g:
+        g.snap_db = snapshots.open_snapshot(path)
+    return g.snap_db
 
-    sql, params = 'SELECT * FROM assets WHERE 1=1', []
-    if q:
-        sql += ' AND (name LIKE ? OR asset_id LIKE ? OR location LIKE ?)'; params += [f'%{q}%']*3
-    if cat:
-        sql += ' AND category=?'; params.append(cat)
-    if st:
-        sql += ' AND status=?'; params.append(st)
-    return db.execute(sql+' ORDER BY asset_id', params).fetchall()
+def _count_assets(db):
+    return repository.count_assets(db, **_asset_args())
+
+def _query_assets(db):
+    """Yield matching rows straight off the cursor, in asset_id order."""
+    return repository.iter_assets(db, **_asset_args())
 
 
-@app.route('/export/pdf')
+# Registers larger than this are exported with the streaming writer.
+PDF_STREAM_ROWS = int(os.environ.get('PDF_STREAM_ROWS', 2000))
+
+
+@bp.route('/export/pdf')
 @login_required
 def export_pdf():
-    db      = get_db()
-    assets  = _query_assets(db)
-    company = setting('company_name', 'Asset Registry')
-
-    buf = BytesIO()
-    doc = SimpleDocTemplate(buf, pagesize=landscape(A4),
-                            leftMargin=1.2*cm, rightMargin=1.2*cm,
-                            topMargin=1.5*cm, bottomMargin=1*cm)
-    styles = getSampleStyleSheet()
-    s8  = ParagraphStyle('s8',  parent=styles['Normal'], fontSize=8,  leading=10)
-    sb  = ParagraphStyle('sb',  parent=styles['Normal'], fontSize=8,  leading=10, fontName='Helvetica-Bold')
-    sc  = ParagraphStyle('sc',  parent=styles['Normal'], fontSize=7,  leading=9,  textColor=colors.HexColor('#64748b'))
-    hdr = ParagraphStyle('hdr', parent=styles['Normal'], fontSize=15, fontName='Helvetica-Bold', spaceAfter=4)
-    sub = ParagraphStyle('sub', parent=styles['Normal'], fontSize=8,  textColor=colors.HexColor('#64748b'), spaceAfter=10)
-
-    STATUS_CLR = {'active':'#16a34a', 'maintenance':'#d97706', 'retired':'#dc2626'}
-
-    col_w = [2.2*cm, 2.5*cm, 4.5*cm, 2.8*cm, 3*cm, 2*cm, 3*cm, 3.2*cm, 4.3*cm]
-    rows  = [['QR Code','Asset ID','Name','Category','Location','Status','Serial No.','Custodian','Donor / Programme']]
+    db       = export_db()
+    company  = setting('company_name', 'Asset Registry')
+    base_url = setting('base_url', 'http://localhost:5001')
+    qr_color = setting('qr_color', '#000000')
+    fname    = f'assets_{datetime.now().strftime("%Y%m%d_%H%M%S")}.pdf'
 
-    for a in assets:
-        qr_cell = Paragraph('—', s8)
-        if a['qr_code_path'] and os.path.exists(a['qr_code_path']):
-            try:
-                qr_cell = RLImage(a['qr_code_path'], width=1.8*cm, height=1.8*cm)
-            except Exception:
-                pass
-        sc_st = ParagraphStyle('scs', parent=s8,
-                               textColor=colors.HexColor(STATUS_CLR.get(a['status'], '#374151')))
-        rows.append([
-            qr_cell,
-            Paragraph(a['asset_id'] or '', s8),
-            Paragraph(a['name'] or '', sb),
-            Paragraph(a['category'] or '', s8),
-            Paragraph(a['location'] or '', s8),
-            Paragraph((a['status'] or '').title(), sc_st),
-            Paragraph(a['serial_number'] or '', sc),
-            Paragraph(a['custodian'] or '', sc),
-            Paragraph(a['donor'] or '', sc),
-        ])
-
-    tbl = Table(rows, colWidths=col_w, repeatRows=1)
-    tbl.setStyle(TableStyle([
-        ('BACKGROUND',    (0,0),(-1,0),   colors.HexColor('#1e293b')),
-        ('TEXTCOLOR',     (0,0),(-1,0),   colors.white),
-        ('FONTNAME',      (0,0),(-1,0),   'Helvetica-Bold'),
-        ('FONTSIZE',      (0,0),(-1,0),   8),
-        ('ALIGN',         (0,0),(-1,0),   'CENTER'),
-        ('VALIGN',        (0,0),(-1,-1),  'MIDDLE'),
-        ('ALIGN',         (0,1),(0,-1),   'CENTER'),
-        ('ROWBACKGROUNDS',(0,1),(-1,-1),  [colors.white, colors.HexColor('#f8fafc')]),
-        ('GRID',          (0,0),(-1,-1),  0.4, colors.HexColor('#e2e8f0')),
-        ('LINEBELOW',     (0,0),(-1,0),   2,   colors.HexColor('#0f172a')),
-        ('TOPPADDING',    (0,0),(-1,-1),  5),
-        ('BOTTOMPADDING', (0,0),(-1,-1),  5),
-        ('LEFTPADDING',   (0,0),(-1,-1),  5),
-        ('RIGHTPADDING',  (0,0),(-1,-1),  5),
-    ]))
-
-    doc.build([
-        Paragraph(f'{company} — Asset QR Registry', hdr),
-        Paragraph(f'Generated {datetime.now().strftime("%d %b %Y %H:%M")}  |  {len(assets)} asset(s)', sub),
-        tbl,
-    ])
-    buf.seek(0)
-    fname = f'assets_{datetime.now().strftime("%Y%m%d_%H%M%S")}.pdf'
-    return send_file(buf, mimetype='application/pdf', as_attachment=True, download_name=fname)
-
-
-@app.route('/export/labels')
+    import register_pdf                      # ReportLab loads on the first export only
+    total = _count_assets(db)
+    if request.args.get('stream') == '1' or total > PDF_STREAM_ROWS:
+        snap = snapshot_file()
+        def body():
+            with stream_db(snap) as sdb:
+                yield from register_pdf.register_pdf_stream(_query_assets(sdb), total, company, base_url, qr_color)
+        return Response(stream_with_context(body()), mimetype='application/pdf',
+                        headers={'Content-Disposition': f'attachment; filename={fname}'})
+
+    pdf = register_pdf.register_pdf(list(_query_assets(db)), company, base_url, qr_color)
+    return send_file(BytesIO(pdf), mimetype='application/pdf', as_attachment=True, download_name=fname)
+
+
+@bp.route('/export/labels')
 @login_required
 def export_labels():
-    db     = get_db()
-    assets = _query_assets(db)
-
-    buf = BytesIO()
-    doc = SimpleDocTemplate(buf, pagesize=A4,
-                            leftMargin=0.8*cm, rightMargin=0.8*cm,
-                            topMargin=0.8*cm, bottomMargin=0.8*cm)
-    styles = getSampleStyleSheet()
-    s_name = ParagraphStyle('ln', parent=styles['Normal'], fontSize=7, leading=9,
-                            alignment=TA_CENTER, fontName='Helvetica-Bold')
-    s_id   = ParagraphStyle('li', parent=styles['Normal'], fontSize=6, leading=7,
-                            alignment=TA_CENTER, textColor=colors.HexColor('#475569'))
-
-    COLS  = 4
-    LBL_W = 4.5*cm
-    LBL_H = 5.4*cm
-
-    grid_rows, cur = [], []
+    """QR label sheet; ?sheet= picks the label stock (see labels.SHEETS),
+    otherwise the one chosen on the settings page."""
+    import labels
+    db     = export_db()
+    key    = request.args.get('sheet') or setting('label_sheet', labels.DEFAULT_SHEET)
+    sheet  = labels.SHEETS.get(key) or labels.SHEETS[labels.DEFAULT_SHEET]
+    assets = repository.find_assets(db, cols='a.asset_id, a.name, a.location', **_asset_args())
+    body   = labels.label_pdf(assets, sheet,
+                              setting('base_url', 'http://localhost:5001'),
+                              setting('qr_color', '#000000'),
+                              qr_folder=state().qr_folder,
+                              title=f'{setting("company_name", "Asset Registry")} — QR Labels')
+    fname  = f'qr_labels_{datetime.now().strftime("%Y%m%d_%H%M%S")}.pdf'
+    return Response(body, mimetype='application/pdf',
+                    headers={'Content-Disposition': f'attachment; filename={fname}'})
+
+
+EXPORT_COLS = ['asset_id','name','category','location','status','serial_number',
+               'description','custodian','donor','value_ksh','purchase_date','notes','created_at']
+
+EXPORT_FORMATS = {            # format -> (mimetype, file extension)
+    'csv':      ('text/csv', 'csv'),
+    'columnar': ('text/csv', 'csv'),
+    'tsv':      ('text/tab-separated-values', 'tsv'),
+    'ndjson':   ('application/x-ndjson', 'ndjson'),
+}
+
+class _Echo:
+    """File-like that hands back what csv.writer writes, one row at a time."""
+    def write(self, value):
+        return value
+
+def _export_lines(fmt, assets):
+    if fmt == 'ndjson':
+        for a in assets:
+            yield json.dumps({c: a[c] for c in EXPORT_COLS}, ensure_ascii=False) + '\n'
+        return
+    w = csv.writer(_Echo(), delimiter='\t' if fmt == 'tsv' else ',')
+    yield w.writerow(EXPORT_COLS)
     for a in assets:
-        inner = []
-        if a['qr_code_path'] and os.path.exists(a['qr_code_path']):
-            try:
-                inner.append([RLImage(a['qr_code_path'], width=3.4*cm, height=3.4*cm)])
-            except Exception:
-                inner.append([Paragraph('QR', s_id)])
-        else:
-            inner.append([Paragraph('QR', s_id)])
-        inner.append([Paragraph(f"<b>{(a['name'] or '')[:28]}</b>", s_name)])
-        inner.append([Paragraph(a['asset_id'] or '', s_id)])
-        if a['location']:
-            inner.append([Paragraph(a['location'][:25], s_id)])
-
-        inner_t = Table(inner, colWidths=[LBL_W - 0.6*cm])
-        inner_t.setStyle(TableStyle([
-            ('ALIGN', (0,0),(-1,-1), 'CENTER'),
-            ('VALIGN',(0,0),(-1,-1), 'MIDDLE'),
-            ('TOPPADDING',   (0,0),(-1,-1), 1),
-            ('BOTTOMPADDING',(0,0),(-1,-1), 1),
-        ]))
-        cell = Table([[inner_t]], colWidths=[LBL_W], rowHeights=[LBL_H])
-        cell.setStyle(TableStyle([
-            ('BOX',           (0,0),(-1,-1), 0.5, colors.HexColor('#cbd5e1')),
-            ('ALIGN',         (0,0),(-1,-1), 'CENTER'),
-            ('VALIGN',        (0,0),(-1,-1), 'MIDDLE'),
-            ('BACKGROUND',    (0,0),(-1,-1), colors.white),
-            ('TOPPADDING',    (0,0),(-1,-1), 4),
-            ('BOTTOMPADDING', (0,0),(-1,-1), 4),
-        ]))
-        cur.append(cell)
-        if len(cur) == COLS:
-            grid_rows.append(cur); cur = []
-
-    if cur:
-        while len(cur) < COLS:
-            cur.append('')
-        grid_rows.append(cur)
-
-    if grid_rows:
-        grid = Table(grid_rows, colWidths=[LBL_W]*COLS)
-        grid.setStyle(TableStyle([
-            ('ALIGN', (0,0),(-1,-1), 'CENTER'),
-            ('VALIGN',(0,0),(-1,-1), 'MIDDLE'),
-        ]))
-        doc.build([grid])
-
-    buf.seek(0)
-    fname = f'qr_labels_{datetime.now().strftime("%Y%m%d_%H%M%S")}.pdf'
-    return send_file(buf, mimetype='application/pdf', as_attachment=True, download_name=fname)
-
-
-@app.route('/export/csv')
+        yield w.writerow([a[c] for c in EXPORT_COLS])
+
+def _export_columns(db):
+    """Columnar CSV: one line per field, its name and then its value for
+    every matching asset in asset_id order. Each line is read off its own
+    cursor and written a field at a time, so memory stays flat. All the
+    column queries run in one read transaction, so they see the same rows
+    even if a write lands mid-export."""
+    w = csv.writer(_Echo())
+    db.execute('BEGIN')
+    try:
+        for c in EXPORT_COLS:
+            yield w.writerow([c])[:-2]               # less the '\r\n'
+            for (v,) in repository.iter_assets(db, cols=f'a.{c}', **_asset_args()):
+                # a lone empty field would be written as "" to tell it from an empty row
+                yield ',' + (w.writerow([v])[:-2] if v not in (None, '') else '')
+            yield '\r\n'
+    finally:
+        db.rollback()                            # read-only; ends the snapshot
+
+def _chunked(lines, gz=False, size=64*1024):
+    """Group text lines into ~size byte chunks, gzip-compressing on the fly."""
+    comp = zlib.compressobj(6, zlib.DEFLATED, 31) if gz else None
+    buf, n = [], 0
+    for ln in lines:
+        buf.append(ln); n += len(ln)
+        if n >= size:
+            data = ''.join(buf).encode()
+            buf, n = [], 0
+            yield comp.compress(data) if comp else data
+    data = ''.join(buf).encode()
+    if comp:
+        yield comp.compress(data) + comp.flush()
+    elif data:
+        yield data
+
+
+@bp.route('/export/csv')
 @login_required
 def export_csv():
-    db     = get_db()
-    assets = _query_assets(db)
-    out    = io.StringIO()
-    w      = csv.writer(out)
-    w.writerow(['asset_id','name','category','location','status','serial_number',
-                'description','custodian','donor','value_ksh','purchase_date','notes','created_at'])
-    for a in assets:
-        w.writerow([a['asset_id'], a['name'], a['category'], a['location'], a['status'],
-                    a['serial_number'], a['description'],
-                    a['custodian'], a['donor'], a['value_ksh'],
-                    a['purchase_date'], a['notes'], a['created_at']])
-    out.seek(0)
-    fname = f'assets_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
-    return send_file(io.BytesIO(out.getvalue().encode()),
-                     mimetype='text/csv', as_attachment=True, download_name=fname)
+    fmt = request.args.get('format', 'csv')
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'error': f'Unknown format "{fmt}"'}), 400
+    gz  = request.args.get('gzip') == '1'
+    mimetype, ext = EXPORT_FORMATS[fmt]
+    snap  = snapshot_file()             # an unknown ?snapshot= 404s before streaming starts
+    fname = f'assets_{datetime.now().strftime("%Y%m%d_%H%M%S")}.{ext}' + ('.gz' if gz else '')
+
+    def body():
+        with stream_db(snap) as sdb:
+            lines = _export_columns(sdb) if fmt == 'columnar' else _export_lines(fmt, _query_assets(sdb))
+            yield from _chunked(lines, gz)
+
+    return Response(stream_with_context(body()),
+                    mimetype='application/gzip' if gz else mimetype,
+                    headers={'Content-Disposition': f'attachment; filename={fname}'})
+
+
+# ── App factory ───────────────────────────────────────────────────────────────
+
+def create_app(store=None, qr_folder=None, config=None):
+    """An app over store (a storage backend, default_storage() when None)
+    writing QR codes to qr_folder. Tests and benches pass their own, e.g.
+    create_app(storage.MemoryStorage(), tmp_dir); Vercel, `flask run` and
+    the CLI commands use the module-level `app` below."""
+    app = Flask(__name__)
+    app.secret_key = os.environ.get('SECRET_KEY', 'afosi-assetqr-k3y-2025-change-in-settings')
+    app.config.update(config or {})
+    qr_folder = qr_folder or _qr_folder()
+    os.makedirs(qr_folder, exist_ok=True)
+    s = AppState(store or default_storage(), qr_folder)
+    atexit.register(s.scan_log.flush)
+    app.extensions['assetqr'] = s
+    app.register_blueprint(bp)
+    return app
+
+app = create_app()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,52 @@
+"""
+Bulk import throughput — rows/sec for the single-transaction engine.
+Run:  python bench/bench_bulk_import.py [sizes...]
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app import init_db, bulk_insert  # noqa: E402
+
+SIZES = [1_000, 10_000, 100_000]
+
+
+def make_items(n):
+    cats = ('Furniture', 'Equipment', 'Vehicle', 'ICT')
+    return [{
+        'name':          f'Office Chair {i}',
+        'category':      cats[i % len(cats)],
+        'location':      f'Room {i % 40}',
+        'serial_number': f'SN-{i:07d}',
+        'custodian':     f'Staff {i % 25}',
+        'donor':         'AFOSI',
+        'value_ksh':     str(1000 + i % 9000),
+    } for i in range(n)]
+
+
+def bench(n):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        init_db(path)
+        db    = sqlite3.connect(path)
+        items = make_items(n)
+        t0    = time.perf_counter()
+        done, fail, _ = bulk_insert(db, items)
+        dt    = time.perf_counter() - t0
+        db.close()
+    return len(done), fail, dt
+
+
+def main():
+    sizes = [int(a) for a in sys.argv[1:]] or SIZES
+    print(f'{"rows":>9}  {"inserted":>9}  {"failed":>6}  {"seconds":>8}  {"rows/sec":>10}')
+    for n in sizes:
+        ok, fail, dt = bench(n)
+        print(f'{n:>9}  {ok:>9}  {fail:>6}  {dt:>8.3f}  {ok/dt:>10,.0f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""
+Cold start — what a fresh serverless instance pays before its first request.
+
+Imports app in new interpreters under `python -X importtime` (as on Vercel)
+and checks the median cumulative import time against a budget. Then, in
+one more fresh process, checks that importing app copies no database and
+that serving a scan page loads none of ReportLab, qrcode or PIL. Exits
+non-zero if any check fails.
+Run:  python bench/bench_cold_start.py [runs]      budget: COLD_START_BUDGET_MS (default 275)
+"""
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT   = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BUDGET = float(os.environ.get('COLD_START_BUDGET_MS', 275))
+HEAVY  = ('reportlab', 'qrcode', 'PIL')
+
+# Runs in a fresh interpreter: the module set a scan leaves behind.
+PROBE = r'''
+import os, shutil, sqlite3, sys, tempfile
+copies = []
+_copy2 = shutil.copy2
+shutil.copy2 = lambda *a, **k: copies.append(a) or _copy2(*a, **k)
+import app as app_mod
+from storage import FileStorage
+print('copied at import:', len(copies))
+print('loaded at import:', ' '.join(m for m in HEAVY if m in sys.modules) or '-')
+
+with tempfile.TemporaryDirectory() as tmp:
+    path = os.path.join(tmp, 'cold.db')
+    app_mod.init_db(path)
+    web = app_mod.create_app(FileStorage(path), tmp)
+    db = sqlite3.connect(path)
+    db.execute("INSERT INTO assets (asset_id, name, location) VALUES ('laptop-0001', 'Laptop', 'Room 4')")
+    db.commit(); db.close()
+    status = web.test_client().get('/asset/laptop-0001').status_code
+print('scan page status:', status)
+print('loaded after scan:', ' '.join(m for m in HEAVY if m in sys.modules) or '-')
+'''
+
+
+def env(**extra):
+    return dict(os.environ, PYTHONPATH=ROOT, **extra)
+
+
+def import_ms():
+    out = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'], cwd=ROOT,
+                         env=env(VERCEL='1'), capture_output=True, text=True, check=True).stderr
+    # "import time: self [us] | cumulative | imported package"
+    for line in out.splitlines():
+        parts = line.split('|')
+        if len(parts) == 3 and parts[2].strip() == 'app':
+            return int(parts[1]) / 1000
+    raise RuntimeError('no importtime line for app:\n' + out[-2000:])
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 7
+    import_ms()                                            # warm the bytecode cache and page cache
+    times = sorted(import_ms() for _ in range(runs))
+    med   = statistics.median(times)
+    print(f'import app (VERCEL=1)  median {med:.0f} ms  min {times[0]:.0f}  max {times[-1]:.0f}  '
+          f'budget {BUDGET:.0f} ms  ({runs} runs)')
+
+    probe = subprocess.run([sys.executable, '-c', f'HEAVY = {HEAVY!r}\n' + PROBE], cwd=ROOT,
+                           env=env(VERCEL='1'), capture_output=True, text=True)
+    print(probe.stdout.rstrip() or probe.stderr[-2000:])
+    report = dict(line.split(': ', 1) for line in probe.stdout.splitlines() if ': ' in line)
+
+    ok = (med <= BUDGET and probe.returncode == 0
+          and report.get('copied at import') == '0'
+          and report.get('loaded at import') == '-'
+          and report.get('scan page status') == '200'
+          and report.get('loaded after scan') == '-')
+    print('OK' if ok else 'FAIL')
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
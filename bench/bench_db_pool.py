@@ -0,0 +1,88 @@
+"""
+Concurrent readers during a bulk import — request latency and throughput
+for the per-request connect + rollback journal vs the WAL connection pool.
+Run:  python bench/bench_db_pool.py [readers] [import_rows]
+"""
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+MODES = {
+    'connect/rollback': {'DB_POOL_SIZE': '0', 'DB_JOURNAL_MODE': 'DELETE', 'DB_SYNCHRONOUS': 'FULL',
+                         'DB_MMAP_MB': '0', 'DB_CACHE_MB': '2', 'DB_STMT_CACHE': '128'},
+    'pool/WAL':         {},
+}
+SEED  = 20_000
+BATCH = 2_000
+
+
+def child(readers, rows):
+    from bench_bulk_import import make_items
+    import dbpool
+    from app import bulk_insert, create_app, init_db
+    from storage import FileStorage
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        init_db(path)
+        db = dbpool.connect(path)
+        bulk_insert(db, make_items(SEED))
+        app = create_app(FileStorage(path), tmp, {'TESTING': True})
+
+        lat, errors, stop = [], [0], threading.Event()
+        ids = [r[0] for r in db.execute('SELECT asset_id FROM assets')]
+
+        def read():
+            c = app.test_client()
+            with c.session_transaction() as s:
+                s['logged_in'] = True
+            while not stop.is_set():
+                t0 = time.perf_counter()
+                r  = c.get(f'/api/assets?limit=50&after={random.choice(ids)}')
+                lat.append(time.perf_counter() - t0)
+                if r.status_code != 200:
+                    errors[0] += 1
+
+        threads = [threading.Thread(target=read) for _ in range(readers)]
+        for t in threads:
+            t.start()
+        t0 = time.perf_counter()
+        items = make_items(rows)
+        for i in range(0, rows, BATCH):
+            bulk_insert(db, items[i:i + BATCH])
+        dt = time.perf_counter() - t0
+        stop.set()
+        for t in threads:
+            t.join()
+        db.close()
+
+    lat.sort()
+    p95 = lat[int(len(lat) * 0.95)] if lat else 0
+    print(f'{len(lat) / dt:>9,.0f}  {statistics.median(lat) * 1000:>8.1f}  '
+          f'{p95 * 1000:>8.1f}  {errors[0]:>6}  {dt:>9.2f}')
+
+
+def main():
+    if sys.argv[1:2] == ['--child']:
+        return child(int(sys.argv[2]), int(sys.argv[3]))
+    readers = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    rows    = int(sys.argv[2]) if len(sys.argv) > 2 else 20_000
+    print(f'{readers} readers, {rows:,} rows imported in batches of {BATCH:,}\n')
+    print(f'{"mode":<18}  {"req/sec":>9}  {"p50 ms":>8}  {"p95 ms":>8}  {"errors":>6}  {"import s":>9}')
+    for name, env in MODES.items():
+        print(f'{name:<18}  ', end='', flush=True)
+        subprocess.run([sys.executable, __file__, '--child', str(readers), str(rows)],
+                       env={**os.environ, **env, 'PYTHONPATH': os.path.join(ROOT, 'bench')},
+                       check=True)
+
+
+if __name__ == '__main__':
+    main()
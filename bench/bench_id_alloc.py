@@ -0,0 +1,83 @@
+"""
+Concurrent asset ID allocation — several processes create assets without
+IDs at the same time, one by one and in bulk blocks, against one database.
+Every generated ID must be unique and no insert may fail on a clash; exits
+non-zero otherwise.
+Run:  python bench/bench_id_alloc.py [workers] [assets_per_worker]
+"""
+import multiprocessing as mp
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+NAMES = ('Office Chair', 'Laptop', 'Projector')
+BLOCK = 50
+
+
+def worker(path, n, start, out):
+    import dbpool
+    import importer
+    db = dbpool.connect(path, timeout=30)
+    start.wait()
+    failed, made = 0, 0
+    while made < n:
+        if made % 2:                                        # single creates, api_create's path
+            name = NAMES[made % len(NAMES)]
+            aid  = importer.allocate_ids(db, [importer.slugify(name)])[0]
+            done, fail, _ = importer.bulk_insert(db, [{'name': name, 'asset_id': aid}], lambda a: '')
+        else:                                               # a bulk block, one reserve per prefix
+            k = min(BLOCK, n - made)
+            done, fail, _ = importer.bulk_insert(db, [{'name': NAMES[i % len(NAMES)]} for i in range(k)],
+                                                 lambda a: '')
+        made   += len(done) + fail
+        failed += fail
+        # A '-x' suffix means the allocator handed out an ID that was already taken
+        failed += sum(a.endswith('-x') for a in done)
+    db.close()
+    out.put(failed)
+
+
+def main():
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    per     = int(sys.argv[2]) if len(sys.argv) > 2 else 2_000
+    from app import init_db
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        init_db(path)
+        import sqlite3
+        db = sqlite3.connect(path)
+        db.executemany('INSERT INTO assets (asset_id, name) VALUES (?, ?)',
+                       [('laptop-0007', 'Laptop'), ('office-chair-0100', 'Office Chair')])
+        db.commit()
+
+        start, out = mp.Event(), mp.Queue()
+        procs = [mp.Process(target=worker, args=(path, per, start, out)) for _ in range(workers)]
+        for p in procs:
+            p.start()
+        t0 = time.perf_counter()
+        start.set()
+        failed = sum(out.get() for _ in procs)
+        for p in procs:
+            p.join()
+        dt = time.perf_counter() - t0
+
+        total, distinct = db.execute('SELECT COUNT(*), COUNT(DISTINCT asset_id) FROM assets').fetchone()
+        low = db.execute("SELECT MIN(asset_id) FROM assets WHERE asset_id LIKE 'laptop-%' "
+                         "AND asset_id != 'laptop-0007'").fetchone()[0]
+        db.close()
+
+    expected = workers * per + 2
+    print(f'{workers} workers x {per} assets in {dt:.2f}s ({workers * per / dt:,.0f} ids/s)')
+    print(f'rows {total}  distinct {distinct}  expected {expected}  failed {failed}  '
+          f'first new laptop {low}')
+    ok = failed == 0 and total == distinct == expected and low == 'laptop-0008'
+    print('OK' if ok else 'FAIL')
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""
+Label sheets — the old nested-Table grid versus the canvas label engine,
+serial and on the process pool.
+
+"warm" runs have every module matrix in qr_modules' cache, so they time
+layout and drawing only; "png" runs read matrices back from pre-rendered
+QR PNGs, as an export does when QR_FOLDER is up to date.
+Run:  python bench/bench_labels.py [labels] [workers]
+"""
+import os
+import sys
+import tempfile
+import time
+from io import BytesIO
+
+N = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000
+os.environ.setdefault('QR_MEM_CACHE', str(N))             # room for every matrix in warm runs
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from reportlab.lib import colors                             # noqa: E402
+from reportlab.lib.pagesizes import A4                       # noqa: E402
+from reportlab.lib.units import cm                           # noqa: E402
+from reportlab.platypus import Paragraph, SimpleDocTemplate, Table, TableStyle  # noqa: E402
+from reportlab.lib.styles import getSampleStyleSheet        # noqa: E402
+
+import labels                                                # noqa: E402
+from register_pdf import QRFlowable                                 # noqa: E402
+from qr_service import qr_modules, render_qr                 # noqa: E402
+
+BASE_URL = 'https://assets.example.org'
+COLOR    = '#000000'
+
+
+def table_grid(assets):
+    # What export_labels built before: a nested Table per label in one grid Table
+    s = getSampleStyleSheet()['Normal']
+    cells = []
+    for a in assets:
+        inner = Table([[QRFlowable(f'{BASE_URL}/asset/{a["asset_id"]}', 3.4*cm, COLOR)],
+                       [Paragraph(f"<b>{a['name'][:28]}</b>", s)], [Paragraph(a['asset_id'], s)],
+                       [Paragraph(a['location'][:25], s)]], colWidths=[3.9*cm])
+        cell = Table([[inner]], colWidths=[4.5*cm], rowHeights=[5.4*cm])
+        cell.setStyle(TableStyle([('BOX', (0, 0), (-1, -1), 0.5, colors.HexColor('#cbd5e1'))]))
+        cells.append(cell)
+    rows = [cells[i:i + 4] for i in range(0, len(cells), 4)]
+    rows[-1] += [''] * (4 - len(rows[-1]))
+    buf = BytesIO()
+    SimpleDocTemplate(buf, pagesize=A4, leftMargin=0.8*cm, rightMargin=0.8*cm,
+                      topMargin=0.8*cm, bottomMargin=0.8*cm).build([Table(rows, colWidths=[4.5*cm]*4)])
+    return len(buf.getvalue())
+
+
+def engine(assets, qr_folder=None, workers=0):
+    return sum(len(c) for c in labels.label_pdf(assets, labels.SHEETS['a4-4x5'], BASE_URL, COLOR,
+                                                qr_folder=qr_folder, workers=workers))
+
+
+def timed(name, fn, *args):
+    t0   = time.perf_counter()
+    size = fn(*args)
+    dt   = time.perf_counter() - t0
+    print(f'{name:<28}  {dt:>8.2f}s  {size / 1024:>9,.0f} KB')
+
+
+def main():
+    n       = N
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else labels.LABEL_WORKERS or 1
+    assets  = [{'asset_id': f'AFOSI-{i:06d}', 'name': f'Office chair, ergonomic mesh #{i}',
+                'location': f'Nairobi HQ — Floor {i % 9}'} for i in range(n)]
+    print(f'{n} labels, {workers} worker(s), {os.cpu_count()} CPU(s)')
+    with tempfile.TemporaryDirectory() as tmp:
+        for a in assets:
+            render_qr(f'{BASE_URL}/asset/{a["asset_id"]}', os.path.join(tmp, f'qr_{a["asset_id"]}.png'), COLOR)
+        timed('engine, png, serial', engine, assets, tmp, 0)
+        timed(f'engine, png, pool x{workers}', engine, assets, tmp, workers)
+        for a in assets:
+            qr_modules(f'{BASE_URL}/asset/{a["asset_id"]}')
+        timed('engine, warm, serial', engine, assets, None, 0)
+        timed('table grid, warm', table_grid, assets)
+
+
+if __name__ == '__main__':
+    main()
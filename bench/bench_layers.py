@@ -0,0 +1,61 @@
+"""
+Each layer on its own, per storage backend — a repository call straight
+on a connection, the same data through a view (Flask test client, no
+HTTP), so a regression can be pinned on the layer that has it.
+Run:  python bench/bench_layers.py [assets] [seconds]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import app as app_mod  # noqa: E402
+import repository  # noqa: E402
+from storage import FileStorage, MemoryStorage  # noqa: E402
+
+
+def rate(fn, seconds):
+    n, end = 0, time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        fn(); n += 1
+    return n / seconds
+
+
+def run(label, store, tmp, assets, seconds):
+    web = app_mod.create_app(store, os.path.join(tmp, f'qr-{store.kind}'))
+    db  = store.acquire()
+    repository.init_db(db)
+    with web.app_context():
+        app_mod.bulk_insert(db, [{'name': f'Laptop {i}', 'location': f'Room {i % 30}'} for i in range(assets)])
+    ids = [r[0] for r in db.execute('SELECT asset_id FROM assets')]
+    c   = web.test_client()
+    with c.session_transaction() as s:
+        s['logged_in'] = True
+
+    rows = [
+        ('repository.asset',       lambda: repository.asset(db, random.choice(ids))),
+        ('repository.find_assets', lambda: repository.find_assets(db, after=random.choice(ids), limit=50)),
+        ('GET /asset/<id>',        lambda: c.get(f'/asset/{random.choice(ids)}')),
+        ('GET /api/assets',        lambda: c.get(f'/api/assets?limit=50&after={random.choice(ids)}')),
+    ]
+    for name, fn in rows:
+        print(f'{label:<8}  {name:<24}  {rate(fn, seconds):>10,.0f}')
+    store.release(db)
+    web.extensions['assetqr'].scan_log.flush()          # scans go in before the pool closes
+    store.close()
+
+
+def main():
+    assets  = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 1
+    print(f'{assets:,} assets, {seconds:g}s per row\n')
+    print(f'{"storage":<8}  {"layer":<24}  {"ops/sec":>10}')
+    with tempfile.TemporaryDirectory() as tmp:
+        run('memory', MemoryStorage(), tmp, assets, seconds)
+        run('file', FileStorage(os.path.join(tmp, 'bench.db')), tmp, assets, seconds)
+
+
+if __name__ == '__main__':
+    main()
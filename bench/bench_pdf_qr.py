@@ -0,0 +1,68 @@
+"""
+PDF label sheets — raster PNG QR codes (the old RLImage path) versus
+vector QRFlowable drawing. Reports build time and PDF size; "warm" is the
+vector build with module matrices already in qr_modules' cache.
+Run:  python bench/bench_pdf_qr.py [labels...]
+"""
+import os
+import sys
+import tempfile
+import time
+from io import BytesIO
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from reportlab.lib.pagesizes import A4                       # noqa: E402
+from reportlab.lib.units import cm                           # noqa: E402
+from reportlab.platypus import SimpleDocTemplate, Table, Image as RLImage  # noqa: E402
+
+from register_pdf import QRFlowable                                 # noqa: E402
+from qr_service import render_qr, qr_modules                 # noqa: E402
+
+SIZES    = [1_000]
+BASE_URL = 'https://assets.example.org'
+COLS     = 4
+
+
+def build(cells):
+    rows = [cells[i:i + COLS] for i in range(0, len(cells), COLS)]
+    rows[-1] += [''] * (COLS - len(rows[-1]))
+    buf = BytesIO()
+    SimpleDocTemplate(buf, pagesize=A4).build([Table(rows, colWidths=[4.5*cm]*COLS)])
+    return len(buf.getvalue())
+
+
+def bench(n, tmp):
+    urls = [f'{BASE_URL}/asset/AFOSI-{i:06d}' for i in range(n)]
+
+    paths = []
+    for u in urls:                          # pre-rendered, as QR_FOLDER would be
+        p = os.path.join(tmp, f'{len(paths)}.png')
+        render_qr(u, p)
+        paths.append(p)
+    t0 = time.perf_counter()
+    raster = build([RLImage(p, width=3.4*cm, height=3.4*cm) for p in paths])
+    t_raster = time.perf_counter() - t0
+
+    qr_modules.cache_clear()                # cold: includes matrix encoding
+    t0 = time.perf_counter()
+    vector = build([QRFlowable(u, 3.4*cm) for u in urls])
+    t_cold = time.perf_counter() - t0
+
+    t0 = time.perf_counter()                # warm: matrices already cached
+    build([QRFlowable(u, 3.4*cm) for u in urls])
+    t_warm = time.perf_counter() - t0
+    return (('raster', t_raster, raster), ('vector', t_cold, vector),
+            ('warm', t_warm, vector))
+
+
+def main():
+    sizes = [int(a) for a in sys.argv[1:]] or SIZES
+    print(f'{"labels":>7}  {"mode":>6}  {"seconds":>8}  {"PDF bytes":>11}')
+    for n in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            for mode, dt, size in bench(n, tmp):
+                print(f'{n:>7}  {mode:>6}  {dt:>8.2f}  {size:>11,}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+Public scan page throughput — requests/sec against a local HTTP server for
+an uncached render, a cached page and an ETag revalidation (304).
+Run:  python bench/bench_scan_page.py [clients] [seconds]
+"""
+import http.client
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import app as app_mod  # noqa: E402
+from storage import FileStorage  # noqa: E402
+from werkzeug.serving import WSGIRequestHandler, make_server  # noqa: E402
+
+ASSETS = 1_000
+ETAGS  = {}       # asset_id -> last ETag seen, replayed as If-None-Match
+
+
+class QuietHandler(WSGIRequestHandler):
+    protocol_version = 'HTTP/1.1'      # keep-alive, like a browser
+
+    def log_request(self, *args):
+        pass
+
+
+def load(port, ids, seconds, clients, revalidate):
+    etags, count, stop = ETAGS, [0] * clients, time.perf_counter() + seconds
+
+    def client(n):
+        conn = http.client.HTTPConnection('127.0.0.1', port)
+        while time.perf_counter() < stop:
+            a       = random.choice(ids)
+            headers = {'If-None-Match': etags[a]} if revalidate and a in etags else {}
+            conn.request('GET', f'/asset/{a}', headers=headers)
+            r = conn.getresponse()
+            r.read()
+            if r.status == 200:
+                etags[a] = r.getheader('ETag')
+            elif r.status != 304:
+                raise SystemExit(f'/asset/{a}: HTTP {r.status}')
+            count[n] += 1
+        conn.close()
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return sum(count) / seconds
+
+
+def main():
+    clients = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 5
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        app_mod.init_db(path)
+        web = app_mod.create_app(FileStorage(path), tmp)
+        db = sqlite3.connect(path)
+        app_mod.bulk_insert(db, [{'name': f'Laptop {i}', 'category': 'ICT', 'location': f'Room {i % 30}',
+                                  'custodian': f'Staff {i % 25}'} for i in range(ASSETS)])
+        ids = [r[0] for r in db.execute('SELECT asset_id FROM assets')]
+        db.close()
+
+        server = make_server('127.0.0.1', 0, web, threaded=True, request_handler=QuietHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        port = server.server_port
+
+        print(f'{clients} clients, {seconds:g}s per run, {ASSETS:,} assets\n')
+        print(f'{"mode":<22}  {"req/sec":>9}')
+        runs = [('uncached render', 0, False), ('cached page', 2048, False),
+                ('revalidate (304)', 2048, True)]
+        for name, size, reval in runs:
+            app_mod.SCAN_CACHE_SIZE = size
+            web.extensions['assetqr'].scan_pages.clear()
+            if size:
+                load(port, ids, 1, clients, reval)       # warm the cache
+            print(f'{name:<22}  {load(port, ids, seconds, clients, reval):>9,.0f}')
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""
+Audit snapshots — snapshot and diff time on a large register, and the
+worst write latency a live writer sees while a snapshot is being taken.
+Run:  python bench/bench_snapshot.py [assets]
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import dbpool                                          # noqa: E402
+import snapshots                                       # noqa: E402
+from app import init_db, bulk_insert                   # noqa: E402
+from bench_bulk_import import make_items               # noqa: E402
+
+
+def writer(path, stop, lat):
+    db = dbpool.connect(path)
+    i = 0
+    while not stop.is_set():
+        t0 = time.perf_counter()
+        with db:
+            db.execute("UPDATE assets SET location=? WHERE id=?", (f'Moved {i}', i % 1000 + 1))
+        lat.append(time.perf_counter() - t0)
+        i += 1
+        time.sleep(0.002)
+    db.close()
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        os.environ['SNAPSHOT_DIR'] = os.path.join(tmp, 'snapshots')
+        init_db(path)
+        db = dbpool.connect(path)
+        bulk_insert(db, make_items(n))
+        print(f'{n} assets, {os.path.getsize(path) / 1e6:.1f} MB')
+
+        stop, lat = threading.Event(), []
+        t = threading.Thread(target=writer, args=(path, stop, lat))
+        t.start()
+        time.sleep(0.3)
+        before = len(lat)
+        t0   = time.perf_counter()
+        snap = snapshots.create(db, path, 'bench')
+        dt   = time.perf_counter() - t0
+        during = lat[before:]
+        time.sleep(0.3)
+        stop.set(); t.join()
+        print(f'snapshot        {dt:8.3f}s  ({snap["bytes"] / 1e6:.1f} MB)')
+        print(f'writes during   {len(during):8d}   worst {max(during or [0]) * 1000:.1f} ms')
+
+        t0 = time.perf_counter()
+        d  = snapshots.diff(path, snapshots.path_of(path, snap))
+        print(f'diff            {time.perf_counter() - t0:8.3f}s  '
+              f'({len(d["added"])} added, {len(d["removed"])} removed, {len(d["changed"])} changed)')
+        db.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+"""
+Upsert re-import cost — a register imported once, then re-imported
+unchanged and with a few edited rows.
+Run:  python bench/bench_upsert.py [rows]
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app import init_db, bulk_upsert  # noqa: E402
+from bench_bulk_import import make_items  # noqa: E402
+
+
+def register(n):
+    return [dict(it, asset_id=f'REG-{i:06d}') for i, it in enumerate(make_items(n))]
+
+
+def timed(db, items):
+    t0  = time.perf_counter()
+    res = bulk_upsert(db, items)
+    return time.perf_counter() - t0, res
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        init_db(path)
+        db    = sqlite3.connect(path)
+        items = register(n)
+        edited = [dict(it, location='Moved') if i % 100 == 0 else it for i, it in enumerate(items)]
+        print(f'{"run":<22}  {"seconds":>8}  {"inserted":>9}  {"updated":>8}  {"unchanged":>9}')
+        for name, batch in (('first import', items), ('unchanged re-import', items),
+                            ('1% edited', edited)):
+            dt, res = timed(db, batch)
+            print(f'{name:<22}  {dt:>8.3f}  {len(res["inserted"]):>9}  '
+                  f'{len(res["updated"]):>8}  {res["unchanged"]:>9}')
+        db.close()
+
+
+if __name__ == '__main__':
+    main()
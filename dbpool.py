@@ -0,0 +1,110 @@
+"""
+SQLite connection pool — keeps configured connections open between
+requests, so each request skips connect + PRAGMA setup and reuses the
+connection's prepared-statement cache.
+
+    pool = pool_for(path)
+    db   = pool.acquire()
+    ...
+    pool.release(db)
+
+WAL lets readers keep going while a writer (e.g. a bulk import) commits.
+Every knob is an environment variable; DB_POOL_SIZE=0 disables pooling.
+"""
+import os
+import sqlite3
+import threading
+from urllib.parse import parse_qs, urlsplit
+
+POOL_SIZE    = int(os.environ.get('DB_POOL_SIZE', 8))        # idle connections kept per DB
+JOURNAL_MODE = os.environ.get('DB_JOURNAL_MODE', 'WAL')
+SYNCHRONOUS  = os.environ.get('DB_SYNCHRONOUS', 'NORMAL')     # safe with WAL; FULL to fsync every commit
+MMAP_MB      = int(os.environ.get('DB_MMAP_MB', 64))
+CACHE_MB     = int(os.environ.get('DB_CACHE_MB', 16))         # page cache per connection
+BUSY_TIMEOUT = float(os.environ.get('DB_BUSY_TIMEOUT', 10))   # seconds to wait for a lock
+STMT_CACHE   = int(os.environ.get('DB_STMT_CACHE', 256))      # prepared statements per connection
+
+
+def read_only(path):
+    """Whether path is a 'file:...?mode=ro' URI."""
+    return path.startswith('file:') and parse_qs(urlsplit(path).query).get('mode') == ['ro']
+
+
+class Connection(sqlite3.Connection):
+    """A connection that knows the path it was opened with, so per-database
+    caches (repository.has_table) can tell two databases apart."""
+
+    def __init__(self, path, *args, **kwargs):
+        super().__init__(path, *args, **kwargs)
+        self.path = path
+
+
+def connect(path, timeout=BUSY_TIMEOUT):
+    """Open a connection with the configured pragmas and sqlite3.Row rows.
+    path may be a 'file:' URI (in-memory databases, read-only replicas)."""
+    db = sqlite3.connect(path, timeout=timeout, cached_statements=STMT_CACHE,
+                         check_same_thread=False, uri=path.startswith('file:'),
+                         factory=Connection)
+    db.row_factory = sqlite3.Row
+    if not read_only(path):
+        # Switching to WAL writes the file header, and synchronous only
+        # matters to writers: a replica keeps the mode its writer chose
+        if JOURNAL_MODE:
+            db.execute(f'PRAGMA journal_mode={JOURNAL_MODE}')
+        db.execute(f'PRAGMA synchronous={SYNCHRONOUS}')
+    db.execute(f'PRAGMA mmap_size={MMAP_MB * 1024 * 1024}')
+    db.execute(f'PRAGMA cache_size={-CACHE_MB * 1024}')      # negative = KiB
+    return db
+
+
+class ConnectionPool:
+    """Connections are handed out one per request and never shared; up to
+    size idle ones are kept for reuse, extras are closed on release."""
+
+    def __init__(self, path, size=POOL_SIZE):
+        self.path    = path
+        self.size    = size
+        self._idle   = []
+        self._lock   = threading.Lock()
+        self.opened  = 0
+        self.reused  = 0
+
+    def acquire(self):
+        with self._lock:
+            if self._idle:
+                self.reused += 1
+                return self._idle.pop()
+            self.opened += 1
+        return connect(self.path)
+
+    def release(self, db):
+        if db.in_transaction:
+            db.rollback()            # never hand on a half-finished transaction
+        db.row_factory = sqlite3.Row
+        with self._lock:
+            if len(self._idle) < self.size:
+                self._idle.append(db)
+                return
+        db.close()
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for db in idle:
+            db.close()
+
+    def stats(self):
+        with self._lock:
+            return {'path': self.path, 'size': self.size, 'idle': len(self._idle),
+                    'opened': self.opened, 'reused': self.reused}
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def pool_for(path):
+    with _pools_lock:
+        if path not in _pools:
+            _pools[path] = ConnectionPool(path)
+        return _pools[path]
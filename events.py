@@ -0,0 +1,84 @@
+"""
+Asset change history — an append-only log of column-level diffs.
+
+Triggers on `assets` write one row per insert, update and delete, in the
+same transaction as the change itself, so every writer (the edit form,
+bulk update, imports, deletes) is covered and a rolled-back change
+leaves no event behind. `changes` holds only the columns that moved,
+as {"column": [old, new]}:
+
+    update  {"location": ["Store", "Office 4"], "custodian": ["", "J. Doe"]}
+    create  {}                      (the row itself is the starting state)
+    delete  {"name": ["Safe", null]}        the key only; the asset_id is the row's
+
+Updates that touch nothing but updated_at write no event.
+"""
+import json
+
+from importer import DATA_COLS
+
+TRACKED = ('asset_id',) + DATA_COLS
+
+SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS asset_events (
+        id        INTEGER PRIMARY KEY,
+        asset_id  TEXT    NOT NULL,
+        ts        TEXT    NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now')),
+        kind      TEXT    NOT NULL,
+        changes   TEXT    NOT NULL DEFAULT '{}'
+    );
+    CREATE INDEX IF NOT EXISTS idx_events_asset ON asset_events(asset_id, ts, id);
+'''
+
+
+def _diff(pairs):
+    # '{"col":[old,new],...}' built from the non-empty parts only
+    parts = ' || '.join(f"""CASE WHEN {cond} THEN ',"{c}":' || json_array({a}, {b}) ELSE '' END"""
+                        for c, cond, a, b in pairs)
+    return f"'{{' || substr({parts}, 2) || '}}'"
+
+
+DELETE_TRIGGER = '''
+    CREATE TRIGGER IF NOT EXISTS assets_events_ad AFTER DELETE ON assets BEGIN
+        INSERT INTO asset_events (asset_id, kind, changes) VALUES (old.asset_id, 'delete',
+            json_object('name', json_array(old.name, NULL)));
+    END;
+'''
+
+TRIGGERS = f'''
+    CREATE TRIGGER IF NOT EXISTS assets_events_ai AFTER INSERT ON assets BEGIN
+        INSERT INTO asset_events (asset_id, kind) VALUES (new.asset_id, 'create');
+    END;
+    CREATE TRIGGER IF NOT EXISTS assets_events_au AFTER UPDATE ON assets
+    WHEN {' OR '.join(f'old.{c} IS NOT new.{c}' for c in TRACKED)} BEGIN
+        INSERT INTO asset_events (asset_id, kind, changes) VALUES (new.asset_id, 'update',
+            {_diff([(c, f'old.{c} IS NOT new.{c}', f'old.{c}', f'new.{c}') for c in TRACKED])});
+    END;
+''' + DELETE_TRIGGER
+
+
+def init_events(db):
+    db.executescript(SCHEMA + TRIGGERS)
+
+
+def slim_delete_events(db):
+    # Databases from before 11 log a delete with every non-empty field
+    db.executescript('DROP TRIGGER IF EXISTS assets_events_ad;' + DELETE_TRIGGER)
+
+
+# ── Queries ───────────────────────────────────────────────────────────────────
+
+def history_query(asset_id, before=None, limit=50):
+    sql, args = 'SELECT id, ts, kind, changes FROM asset_events WHERE asset_id=?', [asset_id]
+    if before:
+        ts, eid = before.rsplit('|', 1)
+        sql += ' AND (ts, id) < (?, ?)'; args += [ts, int(eid)]
+    return sql + ' ORDER BY ts DESC, id DESC LIMIT ?', args + [limit]
+
+
+def history(db, asset_id, before=None, limit=50):
+    """Newest-first events of one asset. Pass the returned cursor back as
+    before for the next page. Returns (events, cursor or None)."""
+    rows  = db.execute(*history_query(asset_id, before, limit)).fetchall()
+    items = [{'id': r[0], 'ts': r[1], 'kind': r[2], 'changes': json.loads(r[3])} for r in rows]
+    return items, (f'{rows[-1][1]}|{rows[-1][0]}' if len(rows) == limit else None)
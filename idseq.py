@@ -0,0 +1,80 @@
+"""
+Asset ID allocation backed by per-prefix sequences.
+
+An ID pattern such as '{slug}-{n:04d}' (the default) or 'AFOSI-{n:03d}'
+names a sequence per distinct prefix — 'office-chair-{n:04d}',
+'AFOSI-{n:03d}' — whose next number lives in `id_sequences`. Reserving a
+block of numbers is one UPDATE ... RETURNING, so concurrent writers never
+get the same number and a bulk import takes all its numbers at once.
+
+A sequence is seeded from the highest number already used under its
+prefix the first time it is needed, so existing registers carry on where
+they left off (deleted assets never make numbers go backwards).
+"""
+import re
+
+DEFAULT_PATTERN = '{slug}-{n:04d}'
+
+SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS id_sequences (
+        key   TEXT PRIMARY KEY,
+        next  INTEGER NOT NULL
+    ) WITHOUT ROWID;
+'''
+
+_N = re.compile(r'\{n(:[^}]*)?\}')
+
+
+def init_sequences(db):
+    db.executescript(SCHEMA)
+
+
+def is_pattern(pattern):
+    return bool(_N.search(pattern or ''))
+
+
+def sequence_key(slug, pattern=DEFAULT_PATTERN):
+    if not is_pattern(pattern):
+        pattern = DEFAULT_PATTERN
+    return pattern.replace('{slug}', slug)
+
+
+def _split(key):
+    m = _N.search(key)
+    return key[:m.start()], key[m.end():]
+
+
+def _seed(db, key):
+    """Highest number used so far under key's prefix (0 if none)."""
+    prefix, suffix = _split(key)
+    if prefix:
+        # Range scan on the asset_id index instead of LIKE (which cannot use it)
+        rows = db.execute('SELECT asset_id FROM assets WHERE asset_id >= ? AND asset_id < ?',
+                          (prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)))
+    else:
+        rows = db.execute('SELECT asset_id FROM assets')
+    lo, best = len(prefix), 0
+    for (a,) in rows:
+        # prefix + digits + suffix; plain string checks, a regex per key costs more
+        digits = a[lo:len(a) - len(suffix)]
+        if a.startswith(prefix) and a.endswith(suffix) and digits.isascii() and digits.isdigit():
+            best = max(best, int(digits))
+    return best
+
+
+def reserve(db, key, count=1):
+    """Atomically take `count` consecutive numbers from key's sequence.
+    Commits on its own unless the caller already has a transaction open."""
+    outer = db.in_transaction
+    if not db.execute('SELECT 1 FROM id_sequences WHERE key=?', (key,)).fetchone():
+        db.execute('INSERT OR IGNORE INTO id_sequences (key, next) VALUES (?, ?)',
+                   (key, _seed(db, key) + 1))
+    end = db.execute('UPDATE id_sequences SET next = next + ? WHERE key=? RETURNING next',
+                     (count, key)).fetchall()[0][0]
+    if not outer:
+        db.commit()
+    return range(end - count, end)
+
+
+def format_id(key, n):
+    return _N.sub(lambda m: format(n, (m.group(1) or ':')[1:]), key, count=1)
@@ -3,11 +3,13 @@ AFOSI Asset Register import — clears existing records and reimports from sourc
 Run:  python import_register.py
 """
 import os
-import sqlite3
-import qrcode
-import qrcode.constants
 
-DB_PATH   = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'assetqr.db')
+import repository
+from importer import bulk_upsert
+from storage import open_storage
+
+DB_PATH   = os.environ.get('ASSETQR_DB') or os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                         'assetqr.db')
 QR_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'qrcodes')
 os.makedirs(QR_FOLDER, exist_ok=True)
 
@@ -302,85 +304,42 @@ ASSETS = [
 ]
 
 
-def get_base_url(db):
-    row = db.execute("SELECT value FROM settings WHERE key='base_url'").fetchone()
-    return (row[0] if row else 'http://localhost:5001').rstrip('/')
-
-
-def make_qr(asset_id, base_url):
-    url  = f'{base_url}/asset/{asset_id}'
-    qr   = qrcode.QRCode(
-        error_correction=qrcode.constants.ERROR_CORRECT_H,
-        box_size=10,
-        border=4,
-    )
-    qr.add_data(url)
-    qr.make(fit=True)
-    img  = qr.make_image(fill_color='black', back_color='white')
-    path = os.path.join(QR_FOLDER, f'qr_{asset_id}.png')
-    img.save(path)
-    return path
+def qr_path(asset_id):
+    return repository.qr_path(QR_FOLDER, asset_id)
 
 
 def run():
-    db       = sqlite3.connect(DB_PATH)
-    base_url = get_base_url(db)
-
-    # Ensure new columns exist (migration for existing DB)
-    for col in ('custodian', 'donor', 'value_ksh'):
-        try:
-            db.execute(f"ALTER TABLE assets ADD COLUMN {col} TEXT DEFAULT ''")
-            db.commit()
-        except Exception:
-            pass
+    store    = open_storage(DB_PATH)
+    db       = store.acquire()
+    repository.init_db(db)
+    base_url = repository.base_url(db)
+    qr_color = repository.get_setting(db, 'qr_color', '#000000')
 
     print(f'Base URL : {base_url}')
     print(f'Updating {len(ASSETS)} assets (upsert)...\n')
 
-    ok = 0
-    for a in ASSETS:
-        existing = db.execute('SELECT id FROM assets WHERE asset_id=?', (a['asset_id'],)).fetchone()
-        if existing:
-            db.execute('''
-                UPDATE assets SET
-                    name=?, category=?, description=?, location=?, status='active',
-                    serial_number=?, purchase_date=?, custodian=?, donor=?,
-                    value_ksh=?, notes=?, updated_at=datetime('now')
-                WHERE asset_id=?
-            ''', (
-                a['name'], a['category'], a['description'], a['location'],
-                a['serial_number'], a['purchase_date'],
-                a['custodian'], a['donor'], a['value_ksh'], a['notes'],
-                a['asset_id'],
-            ))
-            action = 'UPDATED'
-        else:
-            db.execute('''
-                INSERT INTO assets
-                  (asset_id, name, category, description, location, status,
-                   serial_number, purchase_date, custodian, donor, value_ksh, notes)
-                VALUES (?,?,?,?,?,?,?,?,?,?,?,?)
-            ''', (
-                a['asset_id'], a['name'], a['category'], a['description'],
-                a['location'], 'active', a['serial_number'], a['purchase_date'],
-                a['custodian'], a['donor'], a['value_ksh'], a['notes'],
-            ))
-            action = 'INSERTED'
-        db.commit()
-
-        qr_path = make_qr(a['asset_id'], base_url)
-        db.execute('UPDATE assets SET qr_code_path=? WHERE asset_id=?', (qr_path, a['asset_id']))
-        db.commit()
+    res    = bulk_upsert(db, [dict(a, status='active') for a in ASSETS], qr_path)
+    action = {a: 'INSERTED' for a in res['inserted']} | {a: 'UPDATED' for a in res['updated']}
+    for err in res['errors']:
+        print(f'  FAILED    {err}')
 
-        print(f'  {action:8s}  {a["asset_id"]}  {a["name"]} ({a["custodian"]})')
-        ok += 1
-
-    db.execute("INSERT OR REPLACE INTO settings VALUES ('company_name', 'AFOSI')")
-    db.commit()
-    db.close()
+    rendered, paths = 0, []
+    for a in ASSETS:
+        path, fresh = repository.make_qr(QR_FOLDER, a['asset_id'], base_url, qr_color)
+        rendered += fresh
+        paths.append((path, a['asset_id']))
+        print(f'  {action.get(a["asset_id"], "UNCHANGED"):9s} {a["asset_id"]}  {a["name"]} ({a["custodian"]})')
+    repository.set_qr_paths(db, paths)
+    if repository.get_setting(db, 'company_name') != 'AFOSI':
+        repository.save_settings(db, {'company_name': 'AFOSI'})
+    store.release(db)
+    store.close()
 
-    print(f'\nDONE: {ok} assets processed.')
-    print(f'QR codes saved to: {os.path.abspath(QR_FOLDER)}')
+    ok = len(ASSETS) - res['failed']
+    print(f'\nDONE: {ok} assets processed '
+          f'({len(res["inserted"])} inserted, {len(res["updated"])} updated, {res["unchanged"]} unchanged).')
+    print(f'QR codes saved to: {os.path.abspath(QR_FOLDER)} '
+          f'({rendered} rendered, {len(ASSETS) - rendered} unchanged)')
 
 
 if __name__ == '__main__':
@@ -0,0 +1,206 @@
+"""
+Bulk import engine — shared by the web API and import_register.py.
+
+bulk_insert() always creates new assets (clashing IDs get a '-x' suffix);
+bulk_upsert() matches on asset_id, inserts new ones, updates the ones whose
+fields changed and leaves identical rows untouched, so re-importing an
+unchanged register writes nothing.
+
+Both take qr_path(asset_id) -> file path, which differs per deployment.
+"""
+import re
+import sqlite3
+
+import idseq
+
+ASSET_COLS = ('asset_id', 'name', 'category', 'description', 'location',
+              'status', 'serial_number', 'purchase_date',
+              'custodian', 'donor', 'value_ksh', 'notes', 'qr_code_path')
+
+# Fields an import may set; compared to decide whether a row changed
+DATA_COLS = tuple(c for c in ASSET_COLS if c not in ('asset_id', 'qr_code_path'))
+DEFAULTS  = {c: '' for c in DATA_COLS} | {'status': 'active'}
+
+INSERT_ASSET = (f'INSERT INTO assets ({", ".join(ASSET_COLS)}) '
+               f'VALUES ({",".join("?" * len(ASSET_COLS))})')
+
+_UPSERT_ASSET = (INSERT_ASSET + ' ON CONFLICT(asset_id) DO UPDATE SET ' +
+                 ', '.join(f'{c}=excluded.{c}' for c in DATA_COLS) +
+                 ", updated_at=datetime('now')")
+
+LOOKUP_CHUNK = 500           # asset_ids per IN (...) when reading existing rows
+
+
+def clean(value):
+    """Stored form of an imported field: trimmed text, '' for None."""
+    return '' if value is None else str(value).strip()
+
+
+def fields(item, base=DEFAULTS):
+    """DATA_COLS values for item: given fields clean()ed, the rest from base
+    (the stored row on upsert, DEFAULTS for a new asset)."""
+    return tuple(clean(item[c]) if item.get(c) is not None else base[c] for c in DATA_COLS)
+
+
+def slugify(text):
+    text = (text or '').lower().strip()
+    text = re.sub(r'[^\w\s-]', '', text)
+    text = re.sub(r'[\s_]+', '-', text)
+    return text[:30].strip('-')
+
+
+def _apply(db, sql, rows):
+    """executemany rows in one transaction; if anything is rejected, replay
+    row by row (still one transaction) so the report names the bad rows.
+    Returns (asset_ids written, failed, errors)."""
+    try:
+        with db:
+            db.executemany(sql, rows)
+        return [r[0] for r in rows], 0, []
+    except sqlite3.Error:
+        pass
+
+    done, fail, errors = [], 0, []
+    with db:
+        db.execute('BEGIN')
+        for r in rows:
+            try:
+                db.execute('SAVEPOINT row')
+                db.execute(sql, r)
+                db.execute('RELEASE row')
+                done.append(r[0])
+            except sqlite3.Error as ex:
+                db.execute('ROLLBACK TO row')
+                db.execute('RELEASE row')
+                fail += 1; errors.append(f'{r[1]}: {ex}')
+    return done, fail, errors
+
+
+def taken_ids(db, asset_ids):
+    """The subset of asset_ids already in the register."""
+    found = set()
+    for i in range(0, len(asset_ids), LOOKUP_CHUNK):
+        part = asset_ids[i:i + LOOKUP_CHUNK]
+        found.update(r[0] for r in db.execute(
+            f'SELECT asset_id FROM assets WHERE asset_id IN ({",".join("?" * len(part))})', part))
+    return found
+
+
+def allocate_ids(db, slugs, pattern=idseq.DEFAULT_PATTERN):
+    """One new asset ID per slug, from the per-prefix sequences. Each
+    sequence is advanced once for the whole list."""
+    keys  = [idseq.sequence_key(s, pattern) for s in slugs]
+    want  = {}
+    for k in keys:
+        want[k] = want.get(k, 0) + 1
+    # One transaction for every prefix: a commit per distinct name would
+    # cost an fsync each on imports where every name is different
+    outer = db.in_transaction
+    if not outer:
+        db.execute('BEGIN IMMEDIATE')
+    try:
+        block = {k: iter(idseq.reserve(db, k, n)) for k, n in want.items()}
+    except BaseException:
+        if not outer:
+            db.rollback()
+        raise
+    if not outer:
+        db.commit()
+    return [idseq.format_id(k, next(block[k])) for k in keys]
+
+
+def bulk_insert(db, items, qr_path, pattern=idseq.DEFAULT_PATTERN):
+    """Validate a whole batch in memory and insert it in one transaction.
+
+    Missing IDs are reserved from the ID sequences in one statement per
+    prefix; only the batch's own IDs are checked against the table. An
+    explicit ID that is already used gets a '-x' suffix. Returns
+    (inserted_asset_ids, failed, errors) with the same per-row messages
+    the old row-by-row loop produced.
+    """
+    fail, errors, valid = 0, [], []
+    for item in items:
+        name = clean(item.get('name'))
+        if not name:
+            fail += 1; errors.append('Blank name skipped'); continue
+        valid.append((item, name))
+
+    auto = [i for i, (item, _) in enumerate(valid) if not clean(item.get('asset_id'))]
+    ids  = [clean(item.get('asset_id')) for item, _ in valid]
+    for i, aid in zip(auto, allocate_ids(db, [slugify(valid[i][1]) or 'asset' for i in auto], pattern)):
+        ids[i] = aid
+
+    # Resolve clashes with stored IDs and within the batch
+    auto  = set(auto)
+    clash = taken_ids(db, ids)
+    while True:
+        seen, redo = set(), []
+        for i, aid in enumerate(ids):
+            if aid in clash or aid in seen:
+                redo.append(i)
+            else:
+                seen.add(aid)
+        if not redo:
+            break
+        fresh = allocate_ids(db, [slugify(valid[i][1]) or 'asset' for i in redo if i in auto], pattern)
+        for i in redo:
+            ids[i] = fresh.pop(0) if i in auto else ids[i] + '-x'
+        clash |= taken_ids(db, [ids[i] for i in redo])
+
+    rows = [(asset_id,) + fields(item) + (qr_path(asset_id),)
+            for (item, _), asset_id in zip(valid, ids)]
+
+    done, f2, e2 = _apply(db, INSERT_ASSET, rows)
+    return done, fail + f2, errors + e2
+
+
+def _existing(db, asset_ids):
+    cols, out = ', '.join(('asset_id',) + DATA_COLS), {}
+    for i in range(0, len(asset_ids), LOOKUP_CHUNK):
+        part = asset_ids[i:i + LOOKUP_CHUNK]
+        for r in db.execute(f'SELECT {cols} FROM assets WHERE asset_id IN ({",".join("?" * len(part))})',
+                            part):
+            out[r[0]] = tuple(r[1:])
+    return out
+
+
+def bulk_upsert(db, items, qr_path, pattern=idseq.DEFAULT_PATTERN):
+    """Insert-or-update by asset_id. Fields an item leaves out keep their
+    stored value; rows whose fields all match what is stored are skipped
+    without a write. Items without an asset_id are inserted as new assets.
+
+    Returns {'inserted': [...], 'updated': [...], 'unchanged': n,
+             'failed': n, 'errors': [...]}.
+    """
+    fail, errors, fresh, keyed = 0, [], [], {}
+    for item in items:
+        asset_id = clean(item.get('asset_id'))
+        if not asset_id:
+            fresh.append(item)
+        elif 'name' in item and not clean(item['name']):
+            fail += 1; errors.append(f'{asset_id}: blank name skipped')
+        else:
+            keyed[asset_id] = item                  # a later row for the same ID wins
+
+    stored = _existing(db, list(keyed))
+    rows, new_ids, unchanged = [], set(), 0
+    for asset_id, item in keyed.items():
+        old    = stored.get(asset_id)
+        base   = dict(zip(DATA_COLS, old)) if old else DEFAULTS
+        values = fields(item, base)
+        if old == values:
+            unchanged += 1
+            continue
+        if not values[0]:
+            fail += 1; errors.append(f'{asset_id}: name is required'); continue
+        if not old:
+            new_ids.add(asset_id)
+        rows.append((asset_id,) + values + (qr_path(asset_id),))
+
+    done, f2, e2 = _apply(db, _UPSERT_ASSET, rows)
+    ins, f3, e3 = bulk_insert(db, fresh, qr_path, pattern) if fresh else ([], 0, [])
+    return {'inserted':  [a for a in done if a in new_ids] + ins,
+            'updated':   [a for a in done if a not in new_ids],
+            'unchanged': unchanged,
+            'failed':    fail + f2 + f3,
+            'errors':    errors + e2 + e3}
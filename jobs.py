@@ -0,0 +1,210 @@
+"""
+Background jobs — a SQLite-backed queue for work too long for a request
+(e.g. regenerating every QR code after base_url / qr_color changes, or
+removing the QR files of assets deleted in bulk).
+
+Jobs record a cursor after every slice, so a worker that dies part-way is
+picked up where it stopped by the next one.
+
+Run a local worker:  python jobs.py [--db path/to/assetqr.db] [--once]
+"""
+import argparse
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+import dbpool
+from qr_service import QRService
+
+SLICE       = int(os.environ.get('JOB_SLICE', 500))   # assets per progress commit
+STALE_AFTER = 60                                     # seconds without heartbeat → reclaimable
+POLL_EVERY  = 1.0
+
+SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS jobs (
+        id          INTEGER PRIMARY KEY AUTOINCREMENT,
+        kind        TEXT    NOT NULL,
+        status      TEXT    NOT NULL DEFAULT 'queued',
+        params      TEXT    NOT NULL DEFAULT '{}',
+        total       INTEGER DEFAULT 0,
+        done        INTEGER DEFAULT 0,
+        failed      INTEGER DEFAULT 0,
+        cursor      TEXT    DEFAULT '',
+        error       TEXT    DEFAULT '',
+        worker      TEXT    DEFAULT '',
+        heartbeat   REAL    DEFAULT 0,
+        created_at  TEXT    DEFAULT (datetime('now')),
+        updated_at  TEXT    DEFAULT (datetime('now'))
+    );
+'''
+
+ACTIVE = ('queued', 'running')
+
+
+def init_jobs(db):
+    db.executescript(SCHEMA)
+
+
+def enqueue(db, kind, params, supersede=True):
+    """Queue a job and return its id. Older queued/running jobs of the same
+    kind are cancelled when supersede is set — their result would be stale."""
+    init_jobs(db)
+    if supersede:
+        db.execute(f"UPDATE jobs SET status='cancelled', updated_at=datetime('now') "
+                   f"WHERE kind=? AND status IN {ACTIVE}", (kind,))
+    cur = db.execute('INSERT INTO jobs (kind, params) VALUES (?, ?)',
+                     (kind, json.dumps(params)))
+    db.commit()
+    return cur.lastrowid
+
+
+def get_job(db, job_id):
+    row = db.execute('SELECT * FROM jobs WHERE id=?', (job_id,)).fetchone()
+    if not row:
+        return None
+    job = dict(row)
+    job['params'] = json.loads(job['params'] or '{}')
+    return job
+
+
+def claim(db, worker_id, job_id=None):
+    """Atomically take the oldest runnable job (queued, running with a dead
+    worker, or already held by worker_id). Returns the job dict or None."""
+    runnable = "(status='queued' OR (status='running' AND (heartbeat < ? OR worker = ?)))"
+    stale    = time.time() - STALE_AFTER
+    sql, args = f'SELECT id FROM jobs WHERE {runnable}', [stale, worker_id]
+    if job_id is not None:
+        sql += ' AND id=?'; args.append(job_id)
+    row = db.execute(sql + ' ORDER BY id LIMIT 1', args).fetchone()
+    if not row:
+        return None
+    cur = db.execute(
+        "UPDATE jobs SET status='running', worker=?, heartbeat=?, updated_at=datetime('now') "
+        f"WHERE id=? AND {runnable}",
+        (worker_id, time.time(), row[0], stale, worker_id))
+    db.commit()
+    return get_job(db, row[0]) if cur.rowcount else None
+
+
+# ── Handlers ──────────────────────────────────────────────────────────────────
+# Each handler processes ONE slice and returns True when the job is complete.
+
+def _regen_qr(db, job, qr):
+    p = job['params']
+    if not job['total']:
+        total = db.execute('SELECT COUNT(*) FROM assets').fetchone()[0]
+        db.execute('UPDATE jobs SET total=? WHERE id=?', (total, job['id']))
+        job['total'] = total
+
+    ids = [r[0] for r in db.execute(
+        'SELECT asset_id FROM assets WHERE asset_id > ? ORDER BY asset_id LIMIT ?',
+        (job['cursor'] or '', SLICE))]
+    if not ids:
+        return True
+
+    batch = qr.render((f"{p['base_url']}/asset/{a}",
+                       os.path.join(p['folder'], f'qr_{a}.png'),
+                       p['qr_color']) for a in ids)
+    job['done']   += batch.done
+    job['failed'] += batch.failed
+    job['cursor']  = ids[-1]
+    if batch.errors:
+        job['error'] = batch.errors[-1]
+    return len(ids) < SLICE
+
+
+def _remove_qr(db, job, qr):
+    # params: {'paths': [...]} — QR files of assets deleted in bulk
+    paths = job['params']['paths']
+    job['total'] = len(paths)
+    start = int(job['cursor'] or 0)
+    for path in paths[start:start + SLICE]:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as ex:
+            job['failed'] += 1; job['error'] = str(ex)
+            continue
+        job['done'] += 1
+    job['cursor'] = str(start + SLICE)
+    return start + SLICE >= len(paths)
+
+
+HANDLERS = {
+    'regen_qr':  _regen_qr,
+    'remove_qr': _remove_qr,
+}
+
+
+def step(db, job, worker_id, qr):
+    """Run one slice of a claimed job and persist its progress."""
+    status = db.execute('SELECT status FROM jobs WHERE id=?', (job['id'],)).fetchone()[0]
+    if status != 'running':
+        return True                      # cancelled / superseded meanwhile
+    try:
+        finished = HANDLERS[job['kind']](db, job, qr)
+        state    = 'done' if finished else 'running'
+    except Exception as ex:
+        finished, state, job['error'] = True, 'failed', str(ex)
+    cur = db.execute(
+        "UPDATE jobs SET status=?, total=?, done=?, failed=?, cursor=?, error=?, "
+        "heartbeat=?, updated_at=datetime('now') WHERE id=? AND worker=? AND status='running'",
+        (state, job['total'], job['done'], job['failed'], job['cursor'], job['error'],
+         time.time(), job['id'], worker_id))
+    db.commit()
+    return finished or not cur.rowcount      # another worker took it over
+
+
+def run_job(db, job, worker_id, qr):
+    while not step(db, job, worker_id, qr):
+        pass
+
+
+# ── Workers ───────────────────────────────────────────────────────────────────
+
+def worker_id():
+    return f'{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}'
+
+
+def work(db_path, once=False, qr=None, stop=None):
+    """Process jobs until stop is set (or the queue is empty, with once)."""
+    db  = dbpool.connect(db_path, timeout=30)
+    qr  = qr or QRService()
+    wid = worker_id()
+    init_jobs(db)
+    try:
+        while not (stop and stop.is_set()):
+            try:
+                job = claim(db, wid)
+                if job:
+                    run_job(db, job, wid, qr)
+                    continue
+            except sqlite3.OperationalError:
+                db.rollback()            # busy database — the job stays resumable
+            if once:
+                break
+            time.sleep(POLL_EVERY)
+    finally:
+        db.close()
+
+
+def start_thread(db_path, qr=None):
+    """Run a worker on a daemon thread inside the web process."""
+    t = threading.Thread(target=work, args=(db_path,), kwargs={'qr': qr},
+                         name='assetqr-jobs', daemon=True)
+    t.start()
+    return t
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser(description='AssetQR background job worker')
+    ap.add_argument('--db', default=os.environ.get('ASSETQR_DB') or
+                    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'assetqr.db'))
+    ap.add_argument('--once', action='store_true', help='exit when the queue is empty')
+    args = ap.parse_args()
+    print(f'Worker {worker_id()} on {args.db}')
+    work(args.db, once=args.once)
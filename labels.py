@@ -0,0 +1,155 @@
+"""
+QR label sheets — labels drawn straight onto PDF pages at computed
+positions, one template per label stock (A4/Letter sheets, roll printers).
+
+    for chunk in label_pdf(assets, SHEETS['avery-l7160'], base_url, qr_color):
+        out.write(chunk)
+
+Large runs are cut into page ranges rendered on a process pool; each range
+comes back as finished page content streams and PDFStream stitches them
+together in order, so the output is the same as a single-process run.
+"""
+import os
+import threading
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from reportlab.lib.pagesizes import A4, letter
+from reportlab.lib.units import cm, inch, mm
+
+from pdfstream import Page, PDFStream, fit_lines
+from qr_service import cached_modules
+
+# 0 renders in the calling process (Vercel has no spare cores to fan out to).
+LABEL_WORKERS  = int(os.environ.get('LABEL_WORKERS',
+                                    0 if os.environ.get('VERCEL') else (os.cpu_count() or 1)))
+PAGES_PER_TASK = int(os.environ.get('LABEL_PAGES_PER_TASK', 20))
+
+# Sizes in points; left/top are the page margins to the first label.
+Sheet = namedtuple('Sheet', 'title page cols rows width height left top gap_x gap_y outline')
+
+SHEETS = {
+    'a4-4x5':      Sheet('A4 · 4 × 5 cut-out labels', A4, 4, 5, 4.5*cm, 5.4*cm,
+                         1.5*cm, 0.8*cm, 0, 0, True),
+    'avery-l7160': Sheet('Avery L7160 · 21 per A4 (63.5 × 38.1 mm)', A4, 3, 7, 63.5*mm, 38.1*mm,
+                         7.2*mm, 15.15*mm, 2.5*mm, 0, False),
+    'avery-l7163': Sheet('Avery L7163 · 14 per A4 (99.1 × 38.1 mm)', A4, 2, 7, 99.1*mm, 38.1*mm,
+                         4.65*mm, 15.15*mm, 2.5*mm, 0, False),
+    'avery-l7165': Sheet('Avery L7165 · 8 per A4 (99.1 × 67.7 mm)', A4, 2, 4, 99.1*mm, 67.7*mm,
+                         4.65*mm, 13.1*mm, 2.5*mm, 0, False),
+    'avery-l7651': Sheet('Avery L7651 · 65 per A4 (38.1 × 21.2 mm)', A4, 5, 13, 38.1*mm, 21.2*mm,
+                         4.75*mm, 10.7*mm, 2.5*mm, 0, False),
+    'avery-5160':  Sheet('Avery 5160 · 30 per Letter (2⅝ × 1 in)', letter, 3, 10, 2.625*inch, 1*inch,
+                         0.1875*inch, 0.5*inch, 0.125*inch, 0, False),
+    'avery-5163':  Sheet('Avery 5163 · 10 per Letter (4 × 2 in)', letter, 2, 5, 4*inch, 2*inch,
+                         0.15625*inch, 0.5*inch, 0.1875*inch, 0, False),
+    'roll-62x29':  Sheet('Roll · 62 × 29 mm (Brother DK-11209)', (62*mm, 29*mm), 1, 1, 62*mm, 29*mm,
+                         0, 0, 0, 0, False),
+    'roll-57x32':  Sheet('Roll · 57 × 32 mm (Dymo 11354)', (57*mm, 32*mm), 1, 1, 57*mm, 32*mm,
+                         0, 0, 0, 0, False),
+    'roll-50x50':  Sheet('Roll · 50 × 50 mm square', (50*mm, 50*mm), 1, 1, 50*mm, 50*mm,
+                         0, 0, 0, 0, False),
+}
+DEFAULT_SHEET = 'a4-4x5'
+
+INK, MUTED, OUTLINE = '#000000', '#475569', '#cbd5e1'
+
+_pool, _pool_lock = None, threading.Lock()
+
+
+def _executor(workers):
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            try:
+                _pool = ProcessPoolExecutor(max_workers=workers)
+            except (OSError, NotImplementedError):
+                _pool = ThreadPoolExecutor(max_workers=1)
+        return _pool
+
+
+# ── Drawing ───────────────────────────────────────────────────────────────────
+
+def _text_lines(label, font_size, width, max_name_lines):
+    asset_id, name, location = label
+    lines  = [(ln, 'F2', font_size, INK) for ln in fit_lines(name, 'F2', font_size, width, max_name_lines)]
+    lines += [(ln, 'F1', font_size - 1, MUTED) for ln in fit_lines(asset_id, 'F1', font_size - 1, width, 1)]
+    if location:
+        lines += [(ln, 'F1', font_size - 1, MUTED) for ln in fit_lines(location, 'F1', font_size - 1, width, 1)]
+    return lines
+
+
+def draw_label(page, sheet, x, y, label, base_url, color, qr_folder=None):
+    """Draw one label with its bottom-left corner at (x, y)."""
+    asset_id = label[0]
+    w, h = sheet.width, sheet.height
+    pad  = min(w, h) * 0.06
+    size = 7 if h >= 3*cm else 6 if h >= 2*cm else 5
+    url  = f'{base_url}/asset/{asset_id}'
+    mods = cached_modules(url, os.path.join(qr_folder, f'qr_{asset_id}.png'), color) if qr_folder else None
+    if sheet.outline:
+        page.rect(x, y, w, h, stroke=OUTLINE, line_width=0.5)
+
+    if h >= w * 0.9:
+        # Tall: code on top, text centred underneath
+        lines  = _text_lines(label, size, w - 2*pad, 2)
+        text_h = sum(s + 2 for _, _, s, _ in lines)
+        q      = min(w - 2*pad, h - 3*pad - text_h)
+        top    = y + (h + q + pad + text_h) / 2
+        page.qr(x + (w - q) / 2, top - q, q, url, color, mods)
+        ty, cx = top - q - pad, x + w / 2
+        align  = 'center'
+    else:
+        # Wide: code on the left, text beside it
+        q     = h - 2*pad
+        page.qr(x + pad, y + pad, q, url, color, mods)
+        cx    = x + 2*pad + q
+        lines = _text_lines(label, size, x + w - pad - cx, 2)
+        while len(lines) > 2 and sum(s + 2 for _, _, s, _ in lines) > h - 2*pad:
+            lines.pop()
+        ty    = y + (h + sum(s + 2 for _, _, s, _ in lines)) / 2
+        align = 'left'
+    for text, font, s, c in lines:
+        ty -= s
+        page.text(cx, ty, text, font, s, c, align)
+        ty -= 2
+
+
+def render_pages(sheet, labels, base_url, color, qr_folder=None):
+    """Compressed content streams for labels laid out page by page."""
+    per, out = sheet.cols * sheet.rows, []
+    page_w, page_h = sheet.page
+    for start in range(0, len(labels), per):
+        page = Page(page_w, page_h)
+        for i, label in enumerate(labels[start:start + per]):
+            col, row = i % sheet.cols, i // sheet.cols
+            x = sheet.left + col * (sheet.width + sheet.gap_x)
+            y = page_h - sheet.top - (row + 1) * sheet.height - row * sheet.gap_y
+            draw_label(page, sheet, x, y, label, base_url, color, qr_folder)
+        out.append(page.compress())
+    return out
+
+
+def _render_task(args):
+    return render_pages(*args)
+
+
+def label_pdf(assets, sheet, base_url, color, qr_folder=None, title='', workers=LABEL_WORKERS):
+    """Yield a label PDF for assets (rows with asset_id, name, location)."""
+    labels = [(a['asset_id'], a['name'] or '', a['location'] or '') for a in assets]
+    step   = sheet.cols * sheet.rows * PAGES_PER_TASK
+    tasks  = [(sheet, labels[i:i + step], base_url, color, qr_folder)
+              for i in range(0, len(labels), step)]
+
+    pdf = PDFStream(sheet.page, title)
+    yield pdf.begin()
+    if workers and len(tasks) > 1:
+        ranges = _executor(workers).map(_render_task, tasks)
+    else:
+        ranges = map(_render_task, tasks)
+    for pages in ranges:
+        for data in pages:
+            yield pdf.emit_content(data)
+    if not labels:
+        yield pdf.emit(pdf.new_page())          # an empty selection still opens
+    yield pdf.end()
@@ -0,0 +1,238 @@
+"""
+Versioned schema migrations, shared by app.py and import_register.py.
+
+Each applied step is recorded in `schema_version`; migrate() runs the ones
+a database has not seen yet, in order. Steps are written to be idempotent
+(IF NOT EXISTS, column checks), so databases created before versioning and
+a step interrupted half-way are both simply brought up to date.
+
+Add a migration by appending to MIGRATIONS — never edit or renumber one
+that has shipped.
+
+    python migrations.py [--db path/to/assetqr.db]
+"""
+import argparse
+import os
+import sqlite3
+
+import events
+import idseq
+import jobs
+import scans
+import snapshots
+
+VERSION_TABLE = '''
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version     INTEGER PRIMARY KEY,
+        name        TEXT    NOT NULL,
+        applied_at  TEXT    DEFAULT (datetime('now'))
+    )
+'''
+
+BASE_SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS assets (
+        id            INTEGER PRIMARY KEY AUTOINCREMENT,
+        asset_id      TEXT    UNIQUE NOT NULL,
+        name          TEXT    NOT NULL,
+        category      TEXT    DEFAULT '',
+        description   TEXT    DEFAULT '',
+        location      TEXT    DEFAULT '',
+        status        TEXT    DEFAULT 'active',
+        serial_number TEXT    DEFAULT '',
+        purchase_date TEXT    DEFAULT '',
+        custodian     TEXT    DEFAULT '',
+        donor         TEXT    DEFAULT '',
+        value_ksh     TEXT    DEFAULT '',
+        notes         TEXT    DEFAULT '',
+        qr_code_path  TEXT    DEFAULT '',
+        created_at    TEXT    DEFAULT (datetime('now')),
+        updated_at    TEXT    DEFAULT (datetime('now'))
+    );
+
+    CREATE TABLE IF NOT EXISTS settings (
+        key   TEXT PRIMARY KEY,
+        value TEXT NOT NULL DEFAULT ''
+    );
+'''
+
+# Columns added after the first release; older databases lack them.
+LATE_COLUMNS = ('custodian', 'donor', 'value_ksh')
+
+# ── Full-text search ──────────────────────────────────────────────────────────
+# assets_fts is an external-content FTS5 index over the searchable columns,
+# kept in step with `assets` by triggers.
+
+SEARCH_COLS = ('asset_id', 'name', 'location', 'description', 'serial_number')
+
+_cols     = ', '.join(SEARCH_COLS)
+_new_cols = ', '.join(f'new.{c}' for c in SEARCH_COLS)
+_old_cols = ', '.join(f'old.{c}' for c in SEARCH_COLS)
+FTS_SCHEMA = f'''
+    CREATE VIRTUAL TABLE IF NOT EXISTS assets_fts USING fts5(
+        {_cols}, content='assets', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    );
+    CREATE TRIGGER IF NOT EXISTS assets_fts_ai AFTER INSERT ON assets BEGIN
+        INSERT INTO assets_fts(rowid, {_cols}) VALUES (new.id, {_new_cols});
+    END;
+    CREATE TRIGGER IF NOT EXISTS assets_fts_ad AFTER DELETE ON assets BEGIN
+        INSERT INTO assets_fts(assets_fts, rowid, {_cols}) VALUES ('delete', old.id, {_old_cols});
+    END;
+    CREATE TRIGGER IF NOT EXISTS assets_fts_au AFTER UPDATE OF {_cols} ON assets BEGIN
+        INSERT INTO assets_fts(assets_fts, rowid, {_cols}) VALUES ('delete', old.id, {_old_cols});
+        INSERT INTO assets_fts(rowid, {_cols}) VALUES (new.id, {_new_cols});
+    END;
+    INSERT INTO assets_fts(assets_fts) VALUES ('rebuild');
+'''
+
+# ── Dashboard counters ────────────────────────────────────────────────────────
+# asset_stats holds one row per (dim, key): ('all', '') for the total and one
+# per status and per category, kept current by triggers.
+
+STATS_SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS asset_stats (
+        dim  TEXT NOT NULL,
+        key  TEXT NOT NULL,
+        cnt  INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (dim, key)
+    ) WITHOUT ROWID;
+    CREATE TRIGGER IF NOT EXISTS asset_stats_ai AFTER INSERT ON assets BEGIN
+        INSERT INTO asset_stats VALUES ('all', '', 1)
+            ON CONFLICT(dim, key) DO UPDATE SET cnt = cnt + 1;
+        INSERT INTO asset_stats VALUES ('status', COALESCE(new.status, ''), 1)
+            ON CONFLICT(dim, key) DO UPDATE SET cnt = cnt + 1;
+        INSERT INTO asset_stats VALUES ('category', COALESCE(new.category, ''), 1)
+            ON CONFLICT(dim, key) DO UPDATE SET cnt = cnt + 1;
+    END;
+    CREATE TRIGGER IF NOT EXISTS asset_stats_ad AFTER DELETE ON assets BEGIN
+        UPDATE asset_stats SET cnt = cnt - 1 WHERE dim = 'all';
+        UPDATE asset_stats SET cnt = cnt - 1 WHERE dim = 'status'   AND key = COALESCE(old.status, '');
+        UPDATE asset_stats SET cnt = cnt - 1 WHERE dim = 'category' AND key = COALESCE(old.category, '');
+    END;
+    CREATE TRIGGER IF NOT EXISTS asset_stats_au AFTER UPDATE OF status, category ON assets BEGIN
+        UPDATE asset_stats SET cnt = cnt - 1 WHERE dim = 'status'   AND key = COALESCE(old.status, '');
+        UPDATE asset_stats SET cnt = cnt - 1 WHERE dim = 'category' AND key = COALESCE(old.category, '');
+        INSERT INTO asset_stats VALUES ('status', COALESCE(new.status, ''), 1)
+            ON CONFLICT(dim, key) DO UPDATE SET cnt = cnt + 1;
+        INSERT INTO asset_stats VALUES ('category', COALESCE(new.category, ''), 1)
+            ON CONFLICT(dim, key) DO UPDATE SET cnt = cnt + 1;
+    END;
+'''
+
+STATS_TRUTH = '''
+    SELECT 'all', '', COUNT(*) FROM assets
+    UNION ALL SELECT 'status',   COALESCE(status, ''),   COUNT(*) FROM assets GROUP BY 2
+    UNION ALL SELECT 'category', COALESCE(category, ''), COUNT(*) FROM assets GROUP BY 2
+'''
+
+# ── Secondary indexes ─────────────────────────────────────────────────────────
+# (status|category, asset_id) serve the filtered list/export in asset_id order
+# without a sort, and cover the GROUP BY recount and the category dropdown.
+
+INDEXES = '''
+    CREATE INDEX IF NOT EXISTS idx_assets_status    ON assets(status, asset_id);
+    CREATE INDEX IF NOT EXISTS idx_assets_category  ON assets(category, asset_id);
+    CREATE INDEX IF NOT EXISTS idx_assets_location  ON assets(location);
+    CREATE INDEX IF NOT EXISTS idx_assets_custodian ON assets(custodian);
+    CREATE INDEX IF NOT EXISTS idx_assets_donor     ON assets(donor);
+'''
+
+# ── Settings version ──────────────────────────────────────────────────────────
+# A single counter bumped by every write to `settings`; processes caching the
+# settings compare it to know when to reload.
+
+SETTINGS_VERSION = '''
+    CREATE TABLE IF NOT EXISTS settings_version (
+        id       INTEGER PRIMARY KEY CHECK (id = 1),
+        version  INTEGER NOT NULL DEFAULT 0
+    );
+    INSERT OR IGNORE INTO settings_version (id, version) VALUES (1, 0);
+    CREATE TRIGGER IF NOT EXISTS settings_version_ai AFTER INSERT ON settings BEGIN
+        UPDATE settings_version SET version = version + 1;
+    END;
+    CREATE TRIGGER IF NOT EXISTS settings_version_au AFTER UPDATE ON settings BEGIN
+        UPDATE settings_version SET version = version + 1;
+    END;
+    CREATE TRIGGER IF NOT EXISTS settings_version_ad AFTER DELETE ON settings BEGIN
+        UPDATE settings_version SET version = version + 1;
+    END;
+'''
+
+
+# ── Steps ─────────────────────────────────────────────────────────────────────
+
+def _base(db):
+    db.executescript(BASE_SCHEMA)
+    have = {r[1] for r in db.execute('PRAGMA table_info(assets)')}
+    for col in LATE_COLUMNS:
+        if col not in have:
+            db.execute(f"ALTER TABLE assets ADD COLUMN {col} TEXT DEFAULT ''")
+
+
+def _fts(db):
+    try:
+        db.executescript(f'BEGIN; {FTS_SCHEMA} COMMIT;')
+    except sqlite3.OperationalError:
+        db.rollback()  # SQLite built without FTS5: searches keep using LIKE
+
+
+def _stats(db):
+    db.executescript(STATS_SCHEMA)
+    rebuild_stats(db)
+
+
+def rebuild_stats(db):
+    with db:
+        db.execute('DELETE FROM asset_stats')
+        db.execute(f'INSERT INTO asset_stats (dim, key, cnt) {STATS_TRUTH}')
+
+
+MIGRATIONS = [
+    (1, 'assets and settings tables', _base),
+    (2, 'background jobs',            jobs.init_jobs),
+    (3, 'full-text search index',     _fts),
+    (4, 'dashboard counters',         _stats),
+    (5, 'secondary indexes',          INDEXES),
+    (6, 'settings version counter',   SETTINGS_VERSION),
+    (7, 'scan log',                   scans.init_scans),
+    (8, 'asset ID sequences',         idseq.init_sequences),
+    (9, 'asset change history',       events.init_events),
+    (10, 'audit snapshots',           snapshots.init_snapshots),
+    (11, 'key-only delete events',    events.slim_delete_events),
+]
+
+
+def current_version(db):
+    db.execute(VERSION_TABLE)
+    return db.execute('SELECT COALESCE(MAX(version), 0) FROM schema_version').fetchone()[0]
+
+
+def migrate(db):
+    """Apply pending migrations. Returns the (version, name) pairs applied."""
+    db.execute(VERSION_TABLE)
+    seen    = {v for (v,) in db.execute('SELECT version FROM schema_version')}
+    applied = []
+    for version, name, step in MIGRATIONS:
+        if version in seen:
+            continue
+        if callable(step):
+            step(db)
+        else:
+            db.executescript(step)
+        db.execute('INSERT OR IGNORE INTO schema_version (version, name) VALUES (?, ?)',
+                   (version, name))
+        db.commit()
+        applied.append((version, name))
+    return applied
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser(description='Bring an AssetQR database up to date')
+    ap.add_argument('--db', default=os.environ.get('ASSETQR_DB') or
+                    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'assetqr.db'))
+    args = ap.parse_args()
+    db = sqlite3.connect(args.db)
+    for version, name in migrate(db):
+        print(f'  applied {version:3d}  {name}')
+    print(f'{args.db} is at schema version {current_version(db)}.')
+    db.close()
@@ -0,0 +1,165 @@
+"""
+Streaming PDF writer — emits each page as soon as it is drawn, so very
+large exports start downloading immediately and memory stays flat.
+
+ReportLab's platypus keeps the whole document until save(); this writer
+only remembers object offsets for the final xref table.
+
+    pdf = PDFStream(landscape(A4))
+    yield pdf.begin()
+    page = pdf.new_page()
+    page.text(40, 500, 'Hello', size=12)
+    yield pdf.emit(page)
+    yield pdf.end()
+
+Only the standard (non-embedded) Helvetica fonts are available.
+"""
+import zlib
+from functools import lru_cache
+
+from reportlab.lib import colors
+from reportlab.pdfbase.pdfmetrics import stringWidth
+
+from qr_service import qr_modules
+
+FONTS = {'F1': 'Helvetica', 'F2': 'Helvetica-Bold'}
+
+
+def _num(v):
+    return f'{v:.2f}'.rstrip('0').rstrip('.')
+
+
+@lru_cache(maxsize=64)                          # a handful of colours, parsed per text run
+def _rgb(color):
+    c = colors.toColor(color)
+    return f'{_num(c.red)} {_num(c.green)} {_num(c.blue)}'
+
+
+def _pdf_str(s):
+    raw = s.encode('cp1252', errors='replace')
+    return raw.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)')
+
+
+def fit_lines(text, font, size, width, max_lines=2):
+    """Greedy word-wrap into at most max_lines, eliding the overflow."""
+    words, lines, cur = (text or '').split(), [], ''
+    for w in words:
+        cand = f'{cur} {w}' if cur else w
+        if stringWidth(cand, FONTS[font], size) <= width:
+            cur = cand
+            continue
+        if cur:
+            lines.append(cur)
+        cur = w
+        if len(lines) == max_lines:
+            break
+    if cur and len(lines) < max_lines:
+        lines.append(cur)
+    elided = ' '.join(lines) != ' '.join(words)
+    for i, ln in enumerate(lines):
+        last = i == len(lines) - 1
+        if stringWidth(ln, FONTS[font], size) > width or (last and elided):
+            while ln and stringWidth(ln + '…', FONTS[font], size) > width:
+                ln = ln[:-1]
+            lines[i] = ln + '…'
+    return lines
+
+
+class Page:
+    def __init__(self, width, height):
+        self.width, self.height = width, height
+        self.ops = []
+
+    def rect(self, x, y, w, h, fill=None, stroke=None, line_width=0.4):
+        op = [f'{_num(x)} {_num(y)} {_num(w)} {_num(h)} re']
+        if fill:
+            self.ops.append(f'{_rgb(fill)} rg')
+        if stroke:
+            self.ops.append(f'{_num(line_width)} w {_rgb(stroke)} RG')
+        op.append('B' if fill and stroke else 'f' if fill else 'S')
+        self.ops.append(' '.join(op))
+
+    def line(self, x1, y1, x2, y2, color, line_width=0.4):
+        self.ops.append(f'{_num(line_width)} w {_rgb(color)} RG '
+                        f'{_num(x1)} {_num(y1)} m {_num(x2)} {_num(y2)} l S')
+
+    def text(self, x, y, s, font='F1', size=8, color='#000000', align='left'):
+        if align == 'center':
+            x -= stringWidth(s, FONTS[font], size) / 2
+        self.ops.append(f'BT /{font} {_num(size)} Tf {_rgb(color)} rg '
+                        f'{_num(x)} {_num(y)} Td ({_pdf_str(s).decode("latin-1")}) Tj ET')
+
+    def qr(self, x, y, size, url, color='#000000', modules=None):
+        n, runs = modules or qr_modules(url)
+        s = size / n
+        rects = ' '.join(f'{rx} {n - 1 - ry} {rn} 1 re' for rx, ry, rn in runs)
+        self.ops.append(f'q {_num(s)} 0 0 {_num(s)} {_num(x)} {_num(y)} cm '
+                        f'{_rgb(color)} rg {rects} f Q')
+
+    def compress(self):
+        """The page's content stream, ready for PDFStream.emit_content()."""
+        return zlib.compress('\n'.join(self.ops).encode('latin-1'))
+
+
+class PDFStream:
+    CATALOG, PAGES, FIRST_FONT = 1, 2, 3
+
+    def __init__(self, pagesize, title=''):
+        self.width, self.height = pagesize
+        self.title   = title
+        self.offsets = [0]                      # byte offset per object number
+        self.pages   = []                       # page object numbers
+        self.pos     = 0
+
+    def _obj(self, num, body, stream=None):
+        while len(self.offsets) <= num:
+            self.offsets.append(0)
+        self.offsets[num] = self.pos
+        out = f'{num} 0 obj\n'.encode() + body
+        if stream is not None:
+            out += b'\nstream\n' + stream + b'\nendstream'
+        out += b'\nendobj\n'
+        self.pos += len(out)
+        return out
+
+    def begin(self):
+        out = b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n'
+        self.pos = len(out)
+        out += self._obj(self.CATALOG, f'<< /Type /Catalog /Pages {self.PAGES} 0 R >>'.encode())
+        self.offsets.append(0)                  # PAGES is written last, by end()
+        for i, name in enumerate(FONTS.values()):
+            out += self._obj(self.FIRST_FONT + i,
+                             f'<< /Type /Font /Subtype /Type1 /BaseFont /{name} '
+                             f'/Encoding /WinAnsiEncoding >>'.encode())
+        return out
+
+    def new_page(self):
+        return Page(self.width, self.height)
+
+    def emit(self, page):
+        return self.emit_content(page.compress())
+
+    def emit_content(self, data):
+        # data may come from Page.compress() in another process
+        c_num = len(self.offsets)
+        out   = self._obj(c_num, f'<< /Length {len(data)} /Filter /FlateDecode >>'.encode(), data)
+        fonts = ' '.join(f'/{k} {self.FIRST_FONT + i} 0 R' for i, k in enumerate(FONTS))
+        out  += self._obj(c_num + 1, (
+            f'<< /Type /Page /Parent {self.PAGES} 0 R '
+            f'/MediaBox [0 0 {_num(self.width)} {_num(self.height)}] '
+            f'/Resources << /Font << {fonts} >> >> /Contents {c_num} 0 R >>').encode())
+        self.pages.append(c_num + 1)
+        return out
+
+    def end(self):
+        kids = ' '.join(f'{p} 0 R' for p in self.pages)
+        out  = self._obj(self.PAGES,
+                         f'<< /Type /Pages /Kids [{kids}] /Count {len(self.pages)} >>'.encode())
+        info = len(self.offsets)
+        out += self._obj(info, b'<< /Producer (AssetQR) /Title (' + _pdf_str(self.title) + b') >>')
+        xref = self.pos
+        out += f'xref\n0 {len(self.offsets)}\n0000000000 65535 f \n'.encode()
+        out += ''.join(f'{o:010d} 00000 n \n' for o in self.offsets[1:]).encode()
+        out += (f'trailer\n<< /Size {len(self.offsets)} /Root {self.CATALOG} 0 R '
+                f'/Info {info} 0 R >>\nstartxref\n{xref}\n%%EOF\n').encode()
+        return out
@@ -0,0 +1,348 @@
+"""
+QR rendering service — encodes QR PNGs on a process pool so request
+handlers only queue the work and return.
+
+    svc   = QRService()
+    batch = svc.submit([(url, path, color), ...])
+    svc.get(batch.id).as_dict()   # {'total': .., 'done': .., 'failed': .., ...}
+
+Every PNG carries a hash of its payload and render parameters, so a code
+that would come out identical is not re-encoded (see render_cached).
+
+Batches live in the memory of the process that queued them; poll the
+same worker for status.
+"""
+import base64
+import hashlib
+import os
+import threading
+import uuid
+import zlib
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+from io import BytesIO
+
+# qrcode and PIL are imported where they are used: the public scan page and
+# a warm QR folder never need them, and they cost a cold start ~35 ms.
+
+# 0 renders inline in the calling thread (used on Vercel, where a function is
+# frozen as soon as the response is sent and background work never finishes).
+QR_WORKERS = int(os.environ.get('QR_WORKERS',
+                                0 if os.environ.get('VERCEL') else (os.cpu_count() or 1)))
+QR_CHUNK   = int(os.environ.get('QR_CHUNK', 64))
+MAX_KEPT   = 200          # finished batches remembered for status polling
+
+# Size bound for the QR folder; 0 = unbounded. /tmp on Vercel is small and
+# shared, so codes are evicted least-recently-used first there.
+QR_CACHE_MAX_BYTES = int(float(os.environ.get(
+    'QR_CACHE_MAX_MB', 128 if os.environ.get('VERCEL') else 0)) * 1024 * 1024)
+
+# Rendered images kept in memory by qr_bytes() for the /qr/ route and exports.
+QR_MEM_CACHE = int(os.environ.get('QR_MEM_CACHE', 1024))
+
+QR_ECC    = 2                                 # qrcode ERROR_CORRECT_H, 30% damage tolerance
+QR_BOX    = 10
+QR_BORDER = 4
+KEY_CHUNK = 'assetqr-key'                     # PNG tEXt chunk holding qr_key()
+MOD_CHUNK = 'assetqr-modules'                 # ... and the packed module matrix
+
+
+def qr_key(url, color, ecc=QR_ECC, box=QR_BOX, border=QR_BORDER):
+    raw = f'{url}\0{color.lower()}\0{ecc}\0{box}\0{border}'
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def stored_key(path):
+    from PIL import Image
+    try:
+        with Image.open(path) as im:      # reads the header chunks only
+            return im.info.get(KEY_CHUNK)
+    except (OSError, ValueError):
+        return None
+
+
+def _encode(url):
+    import qrcode
+    qr = qrcode.QRCode(error_correction=QR_ECC, box_size=QR_BOX, border=QR_BORDER)
+    qr.add_data(url)
+    qr.make(fit=True)
+    return qr
+
+
+def _pack(matrix):
+    bits = bytes(bool(v) for row in matrix for v in row)
+    return f'{len(matrix)}:' + base64.b64encode(zlib.compress(bits)).decode()
+
+
+def _unpack(text):
+    n, data = text.split(':', 1)
+    n, bits = int(n), zlib.decompress(base64.b64decode(data))
+    return n, _runs([bits[y*n:(y+1)*n] for y in range(n)])
+
+
+def _png_info(qr, url, color):
+    from PIL import PngImagePlugin
+    meta = PngImagePlugin.PngInfo()
+    meta.add_text(KEY_CHUNK, qr_key(url, color))
+    meta.add_text(MOD_CHUNK, _pack(qr.get_matrix()))
+    return meta
+
+
+def render_qr(url, path, color='#000000'):
+    qr = _encode(url)
+    qr.make_image(fill_color=color, back_color='white').save(path, pnginfo=_png_info(qr, url, color))
+    return path
+
+
+def _runs(matrix):
+    runs = []
+    size = len(matrix)
+    for y, row in enumerate(matrix):
+        x = 0
+        while x < size:
+            if row[x]:
+                run = 1
+                while x + run < size and row[x + run]:
+                    run += 1
+                runs.append((x, y, run))
+                x += run
+            else:
+                x += 1
+    return tuple(runs)
+
+
+@lru_cache(maxsize=QR_MEM_CACHE)
+def qr_modules(url):
+    """(size, runs) for url's module matrix, quiet zone included. runs holds
+    (x, y, length) for each horizontal run of dark modules, y from the top —
+    what vector outputs (SVG, PDF paths) draw instead of a bitmap."""
+    matrix = _encode(url).get_matrix()
+    return len(matrix), _runs(matrix)
+
+
+def cached_modules(url, path, color='#000000'):
+    """qr_modules(url), read back from the PNG at path when it already holds
+    this exact code: from its header when it carries the matrix, else from
+    the pixels — either is much cheaper than encoding."""
+    from PIL import Image
+    try:
+        with Image.open(path) as im:
+            if im.info.get(KEY_CHUNK) == qr_key(url, color):
+                if im.info.get(MOD_CHUNK):
+                    return _unpack(im.info[MOD_CHUNK])
+                n    = im.size[0] // QR_BOX
+                dark = im.convert('L').resize((n, n), Image.NEAREST).point(lambda v: 255 * (v < 255))
+                rows = dark.tobytes()
+                return n, _runs([rows[y*n:(y+1)*n] for y in range(n)])
+    except (OSError, ValueError):
+        pass
+    return qr_modules(url)
+
+
+def _svg(url, color):
+    # One <path> with a rectangle per horizontal run of dark modules.
+    size, runs = qr_modules(url)
+    d = ''.join(f'M{x} {y}h{n}v1h-{n}z' for x, y, n in runs)
+    return (f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {size} {size}" '
+            f'shape-rendering="crispEdges"><rect width="{size}" height="{size}" fill="#fff"/>'
+            f'<path fill="{color}" d="{d}"/></svg>').encode()
+
+
+@lru_cache(maxsize=QR_MEM_CACHE)
+def qr_bytes(url, color='#000000', fmt='png'):
+    """Render a code in memory as PNG or SVG bytes (LRU-cached per payload)."""
+    if fmt == 'svg':
+        return _svg(url, color)
+    qr   = _encode(url)
+    buf  = BytesIO()
+    qr.make_image(fill_color=color, back_color='white').save(buf, format='PNG', pnginfo=_png_info(qr, url, color))
+    return buf.getvalue()
+
+
+def render_cached(url, path, color='#000000'):
+    """Render unless path already holds this exact code. Returns True when it
+    had to encode (a miss); a hit refreshes the file's mtime for LRU eviction."""
+    if stored_key(path) == qr_key(url, color):
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return False
+    render_qr(url, path, color)
+    return True
+
+
+def _render_chunk(jobs):
+    rendered, hits, errors = 0, 0, []
+    for url, path, color in jobs:
+        try:
+            if render_cached(url, path, color):
+                rendered += 1
+            else:
+                hits += 1
+        except Exception as ex:
+            errors.append(f'{os.path.basename(path)}: {ex}')
+    return rendered, hits, errors
+
+
+class QRCache:
+    """Hit/miss counters for render_cached() plus size-bounded LRU eviction
+    of the QR folder."""
+
+    def __init__(self, folder=None, max_bytes=QR_CACHE_MAX_BYTES):
+        self.folder    = folder
+        self.max_bytes = max_bytes
+        self.hits      = 0
+        self.misses    = 0
+        self.evictions = 0
+        self._lock     = threading.Lock()
+
+    def record(self, hits, misses):
+        with self._lock:
+            self.hits   += hits
+            self.misses += misses
+
+    def evict(self):
+        """Delete least-recently-used codes until the folder is back under
+        90% of max_bytes. Returns the number of files removed."""
+        if not (self.folder and self.max_bytes):
+            return 0
+        files, total = [], 0
+        with os.scandir(self.folder) as it:
+            for e in it:
+                if e.name.startswith('qr_') and e.name.endswith('.png'):
+                    st = e.stat()
+                    files.append((st.st_mtime, st.st_size, e.path))
+                    total += st.st_size
+        if total <= self.max_bytes:
+            return 0
+        removed, target = 0, self.max_bytes * 0.9
+        for _, size, path in sorted(files):
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size; removed += 1
+            except OSError:
+                pass
+        with self._lock:
+            self.evictions += removed
+        return removed
+
+    def stats(self):
+        with self._lock:
+            looked = self.hits + self.misses
+            return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                    'hit_rate': round(self.hits / looked, 4) if looked else None,
+                    'max_bytes': self.max_bytes}
+
+
+class QRBatch:
+    def __init__(self, total):
+        self.id      = uuid.uuid4().hex[:12]
+        self.total   = total
+        self.done    = 0
+        self.skipped = 0          # already up to date (cache hits), counted in done
+        self.failed  = 0
+        self.errors  = []
+        self.pending = 0
+        self.event   = threading.Event()
+
+    @property
+    def finished(self):
+        return self.event.is_set()
+
+    def as_dict(self):
+        return {'id': self.id, 'total': self.total, 'done': self.done,
+                'skipped': self.skipped, 'failed': self.failed, 'finished': self.finished,
+                'errors': self.errors[:50]}
+
+
+class QRService:
+    def __init__(self, workers=QR_WORKERS, chunk=QR_CHUNK, cache=None):
+        self.workers  = workers
+        self.chunk    = max(1, chunk)
+        self.cache    = cache or QRCache()
+        self._pool    = None
+        self._lock    = threading.Lock()
+        self._batches = {}
+
+    def _executor(self):
+        with self._lock:
+            if self._pool is None:
+                try:
+                    self._pool = ProcessPoolExecutor(max_workers=self.workers)
+                except (OSError, NotImplementedError):
+                    # No working multiprocessing primitives (some sandboxes)
+                    self._pool = ThreadPoolExecutor(max_workers=1)
+            return self._pool
+
+    def submit(self, jobs):
+        """Queue (url, path, color) jobs and return their QRBatch immediately."""
+        jobs  = list(jobs)
+        batch = QRBatch(len(jobs))
+        self._remember(batch)
+        if not jobs:
+            batch.event.set()
+            return batch
+
+        chunks = [jobs[i:i + self.chunk] for i in range(0, len(jobs), self.chunk)]
+        batch.pending = len(chunks)
+        if self.workers <= 0:
+            for c in chunks:
+                rendered, hits, errors = _render_chunk(c)
+                self._collect(batch, rendered, hits, len(errors), errors)
+            return batch
+
+        pool = self._executor()
+        for c in chunks:
+            fut = pool.submit(_render_chunk, c)
+            fut.add_done_callback(lambda f, n=len(c): self._collect(batch, *self._result(f, n)))
+        return batch
+
+    def render(self, jobs, timeout=None):
+        """Blocking convenience wrapper around submit()."""
+        batch = self.submit(jobs)
+        batch.event.wait(timeout)
+        return batch
+
+    def get(self, batch_id):
+        with self._lock:
+            return self._batches.get(batch_id)
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool:
+            pool.shutdown(wait=True)
+
+    # ── internals ─────────────────────────────────────────────────────────────
+
+    @staticmethod
+    def _result(fut, n):
+        try:
+            rendered, hits, errors = fut.result()
+            return rendered, hits, len(errors), errors
+        except Exception as ex:          # worker crashed — count the whole chunk
+            return 0, 0, n, [f'{n} code(s) not rendered: {ex}']
+
+    def _collect(self, batch, rendered, hits, failed, errors):
+        self.cache.record(hits, rendered)
+        with self._lock:
+            batch.done    += rendered + hits
+            batch.skipped += hits
+            batch.failed  += failed
+            batch.errors  += errors
+            batch.pending -= 1
+            last = batch.pending <= 0
+        if last:
+            if self.cache.max_bytes and batch.done > batch.skipped:
+                self.cache.evict()
+            batch.event.set()
+
+    def _remember(self, batch):
+        with self._lock:
+            self._batches[batch.id] = batch
+            if len(self._batches) > MAX_KEPT:
+                for bid in [b for b, v in self._batches.items() if v.finished][:len(self._batches) - MAX_KEPT]:
+                    del self._batches[bid]
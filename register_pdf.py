@@ -0,0 +1,164 @@
+"""
+The asset register as a PDF: a platypus table for small registers and a
+page-at-a-time streaming writer for large ones. Both draw the same columns
+with vector QR codes.
+
+Kept out of app.py so ReportLab is only imported by the first export, not
+by every cold start.
+"""
+from datetime import datetime
+from io import BytesIO
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4, landscape
+from reportlab.lib.units import cm
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Flowable
+
+from pdfstream import PDFStream, fit_lines
+from qr_service import qr_modules
+
+
+class QRFlowable(Flowable):
+    """A QR code drawn as vector rectangles (one per run of dark modules)
+    rather than an embedded bitmap: smaller PDFs and nothing to decode."""
+
+    def __init__(self, url, size, color='#000000'):
+        super().__init__()
+        self.url, self.color = url, color
+        self.width = self.height = size
+
+    def draw(self):
+        n, runs = qr_modules(self.url)
+        c = self.canv
+        c.saveState()
+        c.scale(self.width / n, self.height / n)    # integer module coordinates
+        p = c.beginPath()
+        for x, y, run in runs:
+            p.rect(x, n - 1 - y, run, 1)
+        c.setFillColor(colors.HexColor(self.color))
+        c.drawPath(p, stroke=0, fill=1)
+        c.restoreState()
+
+
+STATUS_CLR = {'active':'#16a34a', 'maintenance':'#d97706', 'retired':'#dc2626'}
+
+
+def register_pdf_stream(assets, total, company, base_url, qr_color):
+    """Yield the register PDF page by page (same columns as register_pdf)."""
+    W, H   = landscape(A4)
+    left   = 1.2*cm
+    col_w  = [2.2*cm, 2.5*cm, 4.5*cm, 2.8*cm, 3*cm, 2*cm, 3*cm, 3.2*cm, 4.3*cm]
+    heads  = ['QR Code','Asset ID','Name','Category','Location','Status','Serial No.','Custodian','Donor / Programme']
+    cols   = ['asset_id', 'name', 'category', 'location', 'status', 'serial_number', 'custodian', 'donor']
+    xs     = [left + sum(col_w[:i]) for i in range(len(col_w) + 1)]
+    row_h, head_h, pad = 2.2*cm, 0.75*cm, 5
+    grid   = '#e2e8f0'
+
+    pdf = PDFStream((W, H), title=f'{company} — Asset QR Registry')
+    yield pdf.begin()
+
+    def new_page(first):
+        page = pdf.new_page()
+        y = H - 1.5*cm
+        if first:
+            page.text(left, y - 15, f'{company} — Asset QR Registry', 'F2', 15)
+            page.text(left, y - 30, f'Generated {datetime.now().strftime("%d %b %Y %H:%M")}  |  '
+                                    f'{total} asset(s)', 'F1', 8, '#64748b')
+            y -= 40
+        page.rect(xs[0], y - head_h, xs[-1] - xs[0], head_h, fill='#1e293b')
+        for i, h in enumerate(heads):
+            page.text((xs[i] + xs[i+1]) / 2, y - head_h/2 - 3, h, 'F2', 8, '#ffffff', 'center')
+        page.line(xs[0], y - head_h, xs[-1], y - head_h, '#0f172a', 2)
+        return page, y - head_h
+
+    page, y = new_page(True)
+    n = 0
+    for a in assets:
+        if y - row_h < 1*cm:
+            yield pdf.emit(page)
+            page, y = new_page(False)
+        top, y = y, y - row_h
+        if n % 2:
+            page.rect(xs[0], y, xs[-1] - xs[0], row_h, fill='#f8fafc')
+        n += 1
+        q = 1.8*cm
+        page.qr(xs[0] + (col_w[0] - q) / 2, y + (row_h - q) / 2, q,
+                f'{base_url}/asset/{a["asset_id"]}', qr_color)
+        for i, col in enumerate(cols, start=1):
+            val = a[col] or ''
+            font, size, color = 'F1', 8, '#000000'
+            if col == 'name':
+                font = 'F2'
+            elif col == 'status':
+                val, color = val.title(), STATUS_CLR.get(a['status'], '#374151')
+            elif col in ('serial_number', 'custodian', 'donor'):
+                size, color = 7, '#64748b'
+            lines = fit_lines(val, font, size, col_w[i] - 2*pad, max_lines=3)
+            ty = (top + y) / 2 + (len(lines) - 1) * (size + 2) / 2 - size / 3
+            for ln in lines:
+                page.text(xs[i] + pad, ty, ln, font, size, color)
+                ty -= size + 2
+        page.rect(xs[0], y, xs[-1] - xs[0], row_h, stroke=grid)
+        for x in xs[1:-1]:
+            page.line(x, y, x, top, grid)
+    yield pdf.emit(page)
+    yield pdf.end()
+
+
+def register_pdf(assets, company, base_url, qr_color):
+    """The whole register as one platypus document. Returns the PDF bytes."""
+    buf = BytesIO()
+    doc = SimpleDocTemplate(buf, pagesize=landscape(A4),
+                            leftMargin=1.2*cm, rightMargin=1.2*cm,
+                            topMargin=1.5*cm, bottomMargin=1*cm)
+    styles = getSampleStyleSheet()
+    s8  = ParagraphStyle('s8',  parent=styles['Normal'], fontSize=8,  leading=10)
+    sb  = ParagraphStyle('sb',  parent=styles['Normal'], fontSize=8,  leading=10, fontName='Helvetica-Bold')
+    sc  = ParagraphStyle('sc',  parent=styles['Normal'], fontSize=7,  leading=9,  textColor=colors.HexColor('#64748b'))
+    hdr = ParagraphStyle('hdr', parent=styles['Normal'], fontSize=15, fontName='Helvetica-Bold', spaceAfter=4)
+    sub = ParagraphStyle('sub', parent=styles['Normal'], fontSize=8,  textColor=colors.HexColor('#64748b'), spaceAfter=10)
+
+    col_w = [2.2*cm, 2.5*cm, 4.5*cm, 2.8*cm, 3*cm, 2*cm, 3*cm, 3.2*cm, 4.3*cm]
+    rows  = [['QR Code','Asset ID','Name','Category','Location','Status','Serial No.','Custodian','Donor / Programme']]
+
+    for a in assets:
+        qr_cell = QRFlowable(f'{base_url}/asset/{a["asset_id"]}', 1.8*cm, qr_color)
+        sc_st = ParagraphStyle('scs', parent=s8,
+                               textColor=colors.HexColor(STATUS_CLR.get(a['status'], '#374151')))
+        rows.append([
+            qr_cell,
+            Paragraph(a['asset_id'] or '', s8),
+            Paragraph(a['name'] or '', sb),
+            Paragraph(a['category'] or '', s8),
+            Paragraph(a['location'] or '', s8),
+            Paragraph((a['status'] or '').title(), sc_st),
+            Paragraph(a['serial_number'] or '', sc),
+            Paragraph(a['custodian'] or '', sc),
+            Paragraph(a['donor'] or '', sc),
+        ])
+
+    tbl = Table(rows, colWidths=col_w, repeatRows=1)
+    tbl.setStyle(TableStyle([
+        ('BACKGROUND',    (0,0),(-1,0),   colors.HexColor('#1e293b')),
+        ('TEXTCOLOR',     (0,0),(-1,0),   colors.white),
+        ('FONTNAME',      (0,0),(-1,0),   'Helvetica-Bold'),
+        ('FONTSIZE',      (0,0),(-1,0),   8),
+        ('ALIGN',         (0,0),(-1,0),   'CENTER'),
+        ('VALIGN',        (0,0),(-1,-1),  'MIDDLE'),
+        ('ALIGN',         (0,1),(0,-1),   'CENTER'),
+        ('ROWBACKGROUNDS',(0,1),(-1,-1),  [colors.white, colors.HexColor('#f8fafc')]),
+        ('GRID',          (0,0),(-1,-1),  0.4, colors.HexColor('#e2e8f0')),
+        ('LINEBELOW',     (0,0),(-1,0),   2,   colors.HexColor('#0f172a')),
+        ('TOPPADDING',    (0,0),(-1,-1),  5),
+        ('BOTTOMPADDING', (0,0),(-1,-1),  5),
+        ('LEFTPADDING',   (0,0),(-1,-1),  5),
+        ('RIGHTPADDING',  (0,0),(-1,-1),  5),
+    ]))
+
+    doc.build([
+        Paragraph(f'{company} — Asset QR Registry', hdr),
+        Paragraph(f'Generated {datetime.now().strftime("%d %b %Y %H:%M")}  |  {len(assets)} asset(s)', sub),
+        tbl,
+    ])
+    return buf.getvalue()
@@ -0,0 +1,316 @@
+"""
+Register data access — asset rows and their QR files, the settings table
+and the list/search/export query builder — shared by the web app and
+import_register.py.
+
+Every function takes an open connection (from a storage backend, see
+storage.py, or a plain sqlite3 one), so each can be run and timed without
+Flask:
+
+    db = MemoryStorage().acquire()
+    init_db(db)
+    insert_asset(db, 'AFOSI-001', {'name': 'Laptop'}, '')
+    asset(db, 'AFOSI-001')['name']
+"""
+import os
+import re
+
+from werkzeug.security import generate_password_hash
+
+from importer import INSERT_ASSET, fields, taken_ids
+from migrations import SEARCH_COLS, STATS_TRUTH, migrate
+from qr_service import render_cached
+
+DEFAULT_BASE_URL = 'http://localhost:5001'
+DEFAULT_SETTINGS = {
+    'base_url':       DEFAULT_BASE_URL,
+    'company_name':   'My Organization',
+    'qr_color':       '#000000',
+    'admin_username': 'admin',
+}
+DEFAULT_PASSWORD = 'afosi2025'         # change via Settings page
+
+def init_db(db):
+    """Migrate and add the default settings and admin login where missing."""
+    migrate(db)
+    db.executemany('INSERT OR IGNORE INTO settings VALUES (?, ?)', DEFAULT_SETTINGS.items())
+    if not db.execute("SELECT 1 FROM settings WHERE key='admin_password_hash'").fetchone():
+        db.execute("INSERT INTO settings VALUES ('admin_password_hash', ?)",
+                   (generate_password_hash(DEFAULT_PASSWORD),))
+    db.commit()
+
+
+# ── Settings ──────────────────────────────────────────────────────────────────
+
+def all_settings(db):
+    return {r[0]: r[1] for r in db.execute('SELECT key, value FROM settings')}
+
+
+def settings_version(db):
+    """Counter bumped by triggers on every settings write (migrations.py)."""
+    return db.execute('SELECT version FROM settings_version').fetchone()[0]
+
+
+def get_setting(db, key, default=''):
+    row = db.execute('SELECT value FROM settings WHERE key=?', (key,)).fetchone()
+    return row[0] if row else default
+
+
+def save_settings(db, items):
+    db.executemany('INSERT OR REPLACE INTO settings VALUES (?, ?)', list(items.items()))
+    db.commit()
+
+
+def base_url(db, stored=None):
+    """Public URL the QR codes point at. stored is the base_url setting when
+    the caller already has it (the app's settings cache), else it is read."""
+    # BASE_URL env var overrides the DB value (needed for Vercel deployments)
+    if os.environ.get('BASE_URL'):
+        return os.environ['BASE_URL'].rstrip('/')
+    if stored is None:
+        stored = get_setting(db, 'base_url')
+    return (stored or DEFAULT_BASE_URL).rstrip('/')
+
+
+# ── Assets ────────────────────────────────────────────────────────────────────
+
+def asset(db, asset_id):
+    return db.execute('SELECT * FROM assets WHERE asset_id=?', (asset_id,)).fetchone()
+
+
+def asset_by_pk(db, aid):
+    return db.execute('SELECT * FROM assets WHERE id=?', (aid,)).fetchone()
+
+
+def asset_version(db, asset_id):
+    """A tag that changes with every edit of the asset, None if there is no
+    such asset. It is the id of the asset's latest asset_events row, which
+    every change to its columns appends (events.py), so two edits within
+    the same second still differ; updated_at alone has one-second
+    resolution. Databases without the event log fall back to updated_at."""
+    if has_table(db, 'asset_events'):
+        row = db.execute('SELECT (SELECT MAX(e.id) FROM asset_events e WHERE e.asset_id = a.asset_id) '
+                         'FROM assets a WHERE a.asset_id=?', (asset_id,)).fetchone()
+    else:
+        row = db.execute('SELECT updated_at FROM assets WHERE asset_id=?', (asset_id,)).fetchone()
+    return None if row is None else str(row[0])
+
+
+def asset_exists(db, asset_id):
+    return db.execute('SELECT 1 FROM assets WHERE asset_id=?', (asset_id,)).fetchone() is not None
+
+
+def existing_asset_ids(db, asset_ids):
+    """The subset of asset_ids in the register (chunked IN lookups)."""
+    return taken_ids(db, list(asset_ids))
+
+
+def first_assets(db, limit=10):
+    """The first assets in asset_id order, as the dashboard lists them."""
+    return db.execute('SELECT * FROM assets ORDER BY asset_id LIMIT ?', (limit,)).fetchall()
+
+
+def find_assets(db, **query):
+    """Rows of asset_query(db, **query)."""
+    return db.execute(*asset_query(db, **query)).fetchall()
+
+
+def iter_assets(db, **query):
+    """Rows of asset_query(db, **query), straight off the cursor."""
+    yield from db.execute(*asset_query(db, **query))
+
+
+def categories(db):
+    """Non-empty categories in use, for the list filter."""
+    return [r[0] for r in db.execute(
+        "SELECT DISTINCT category FROM assets WHERE category!='' ORDER BY category")]
+
+
+def insert_asset(db, asset_id, d, qr_path):
+    db.execute(INSERT_ASSET, (asset_id,) + fields(d) + (qr_path,))
+    db.commit()
+
+
+def update_asset(db, row, d):
+    """Apply the fields present in d to row (an assets row); the rest keep
+    their stored values."""
+    db.execute('''
+        UPDATE assets SET name=?, category=?, description=?, location=?,
+            status=?, serial_number=?, purchase_date=?,
+            custodian=?, donor=?, value_ksh=?, notes=?,
+            updated_at=datetime('now')
+        WHERE id=?
+    ''', (d.get('name', row['name']), d.get('category', row['category']),
+          d.get('description', row['description']), d.get('location', row['location']),
+          d.get('status', row['status']), d.get('serial_number', row['serial_number']),
+          d.get('purchase_date', row['purchase_date']),
+          d.get('custodian', row['custodian']), d.get('donor', row['donor']),
+          d.get('value_ksh', row['value_ksh']), d.get('notes', row['notes']),
+          row['id']))
+    db.commit()
+
+
+def delete_asset(db, row):
+    """Delete an assets row and its QR file."""
+    if row['qr_code_path'] and os.path.exists(row['qr_code_path']):
+        try:
+            os.remove(row['qr_code_path'])
+        except Exception:
+            pass
+    db.execute('DELETE FROM assets WHERE id=?', (row['id'],))
+    db.commit()
+
+
+def delete_matching(db, selections):
+    """Delete the assets matched by each of selections (asset_query()
+    kwargs) in one transaction. Returns their (asset_id, qr_code_path)
+    rows; removing the QR files is left to the caller."""
+    gone = []
+    with db:
+        for args in selections:
+            sql, params = asset_query(db, cols='a.id', order=None, **args)
+            gone += db.execute(f'DELETE FROM assets WHERE id IN ({sql}) RETURNING asset_id, qr_code_path',
+                               params).fetchall()
+    return gone
+
+
+def update_matching(db, selections, fields):
+    """Set fields ({column: value}, columns checked by the caller) on the
+    assets matched by selections, in one transaction. Assets that already
+    hold those values are not touched. Returns the (id, asset_id) rows
+    changed."""
+    assign  = ', '.join(f'{k}=?' for k in fields)
+    differs = ' OR '.join(f'{k} IS NOT ?' for k in fields)
+    changed = []
+    with db:
+        for args in selections:
+            sql, params = asset_query(db, cols='a.id', order=None, **args)
+            changed += db.execute(
+                f"UPDATE assets SET {assign}, updated_at=datetime('now') "
+                f'WHERE id IN ({sql}) AND ({differs}) RETURNING id, asset_id',
+                [*fields.values(), *params, *fields.values()]).fetchall()
+    return changed
+
+
+def set_qr_paths(db, pairs):
+    """pairs of (qr_code_path, asset_id); rows already pointing there are not rewritten."""
+    with db:
+        db.executemany('UPDATE assets SET qr_code_path=? WHERE asset_id=? AND qr_code_path IS NOT ?',
+                       [(p, a, p) for p, a in pairs])
+
+
+# ── QR files ──────────────────────────────────────────────────────────────────
+
+def qr_path(folder, asset_id):
+    return os.path.join(folder, f'qr_{asset_id}.png')
+
+
+def make_qr(folder, asset_id, base_url, qr_color):
+    """Returns (path, rendered) — codes whose URL has not changed are reused."""
+    path = qr_path(folder, asset_id)
+    return path, render_cached(f'{base_url}/asset/{asset_id}', path, qr_color)
+
+
+# ── Full-text search ──────────────────────────────────────────────────────────
+# The assets_fts index and its triggers are created by migrations.py. Without
+# FTS5 (or on a database not yet migrated) searches fall back to LIKE.
+
+_tables = {}   # database path -> tables seen there; derived tables are optional on old databases
+
+def has_table(db, name):
+    # Only hits are cached: migrations add tables but never drop one, so a
+    # miss is asked again. Connections not from dbpool (no path) aren't cached
+    path = getattr(db, 'path', None)
+    if name in _tables.get(path, ()):
+        return True
+    if not db.execute("SELECT 1 FROM sqlite_master WHERE name=?", (name,)).fetchone():
+        return False
+    if path:
+        _tables.setdefault(path, set()).add(name)
+    return True
+
+def has_fts(db):
+    return has_table(db, 'assets_fts')
+
+def fts_query(q):
+    """Search box text -> FTS5 query where every word must match a prefix."""
+    return ' '.join(f'"{w}"*' for w in re.findall(r'\w+', q))
+
+
+def asset_query(db, q='', cat='', status='', ids=None, cols='a.*', order='asset_id',
+                after=None, limit=None, offset=None):
+    """SELECT over `assets a` with the list/export filters. ids, when given,
+    overrides the other filters. order='rank' lists search hits by relevance;
+    after (an asset_id) and limit page through asset_id order by keyset,
+    offset through ranked hits, which have no key to page on."""
+    sql, where, params = f'SELECT {cols} FROM assets a', [], []
+    match = fts_query(q) if q and has_fts(db) else ''
+    if ids is not None:
+        where.append(f'a.id IN ({",".join("?"*len(ids))})'); params += ids
+    else:
+        if match:
+            sql += ' JOIN assets_fts f ON f.rowid = a.id'
+            where.append('assets_fts MATCH ?'); params.append(match)
+        elif q:
+            where.append('(' + ' OR '.join(f'a.{c} LIKE ?' for c in SEARCH_COLS) + ')')
+            params += [f'%{q}%'] * len(SEARCH_COLS)
+        if cat:
+            where.append('a.category=?'); params.append(cat)
+        if status:
+            where.append('a.status=?'); params.append(status)
+    if after:
+        where.append('a.asset_id > ?'); params.append(after)
+    if where:
+        sql += ' WHERE ' + ' AND '.join(where)
+    if order == 'rank' and match:
+        sql += ' ORDER BY f.rank, a.asset_id'
+    elif order:
+        sql += ' ORDER BY a.asset_id'          # AFOSI-001, 002, 003 ...
+    if limit:
+        sql += ' LIMIT ?'; params.append(limit)
+        if offset:
+            sql += ' OFFSET ?'; params.append(offset)
+    return sql, params
+
+
+def count_assets(db, q='', cat='', status='', ids=None):
+    """How many assets asset_query() matches. With no filter or a single
+    category/status filter this is one asset_stats row; only a search, an
+    id list or a combined filter counts its matches."""
+    if ids is None and not q and not (cat and status) and has_table(db, 'asset_stats'):
+        dim, key = ('category', cat) if cat else ('status', status) if status else ('all', '')
+        row = db.execute('SELECT cnt FROM asset_stats WHERE dim=? AND key=?', (dim, key)).fetchone()
+        return row[0] if row else 0
+    return db.execute(*asset_query(db, q, cat, status, ids, cols='COUNT(*)', order=None)).fetchone()[0]
+
+
+# ── Dashboard counters ────────────────────────────────────────────────────────
+# asset_stats (see migrations.py) holds trigger-maintained counts per status
+# and category, so the dashboard reads a handful of rows instead of scanning
+# `assets`.
+
+def check_stats(db):
+    """Compare asset_stats with a full recount. Returns {(dim, key): (stored, actual)}
+    for every counter that disagrees."""
+    stored = {(d, k): c for d, k, c in db.execute('SELECT dim, key, cnt FROM asset_stats')}
+    actual = {(d, k): c for d, k, c in db.execute(STATS_TRUTH)}
+    return {k: (stored.get(k, 0), actual.get(k, 0))
+            for k in stored.keys() | actual.keys() if stored.get(k, 0) != actual.get(k, 0)}
+
+def dashboard_stats(db):
+    """Status/category breakdown for the dashboard, from asset_stats when present."""
+    if not has_table(db, 'asset_stats'):
+        rows = db.execute(STATS_TRUTH).fetchall()
+    else:
+        rows = db.execute('SELECT dim, key, cnt FROM asset_stats WHERE cnt > 0').fetchall()
+    counts = {(d, k): c for d, k, c in rows}
+    cats   = sorted(((k, c) for (d, k), c in counts.items() if d == 'category' and k),
+                    key=lambda kc: (-kc[1], kc[0]))
+    stats = {
+        'total':       counts.get(('all', ''), 0),
+        'active':      counts.get(('status', 'active'), 0),
+        'maintenance': counts.get(('status', 'maintenance'), 0),
+        'retired':     counts.get(('status', 'retired'), 0),
+        'categories':  len(cats),
+    }
+    return stats, [{'category': k, 'cnt': c} for k, c in cats[:8]]
@@ -0,0 +1,131 @@
+"""
+Scan log — records every hit on a public /asset/<id> page.
+
+Hits go into an in-memory ring buffer and a background thread writes them
+in batches, one transaction per flush, so a scan never waits on a SQLite
+write. If the database stays busy the buffer keeps the newest CAPACITY
+scans and counts the ones it had to drop.
+
+    recorder = ScanRecorder(lambda: db_path)
+    recorder.record('AFOSI-001', ip, user_agent)
+"""
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+
+import dbpool
+
+CAPACITY    = int(os.environ.get('SCAN_BUFFER', 10_000))    # scans held in memory
+FLUSH_EVERY = float(os.environ.get('SCAN_FLUSH_SECS', 2.0))
+BATCH       = 500                                            # flush early at this many
+
+SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS scans (
+        id          INTEGER PRIMARY KEY AUTOINCREMENT,
+        asset_id    TEXT    NOT NULL,
+        ts          TEXT    NOT NULL,
+        ip          TEXT    DEFAULT '',
+        user_agent  TEXT    DEFAULT ''
+    );
+    CREATE INDEX IF NOT EXISTS idx_scans_asset ON scans(asset_id, id);
+    CREATE INDEX IF NOT EXISTS idx_scans_ts    ON scans(ts, asset_id);
+'''
+
+_INSERT = 'INSERT INTO scans (asset_id, ts, ip, user_agent) VALUES (?, ?, ?, ?)'
+
+
+def init_scans(db):
+    db.executescript(SCHEMA)
+
+
+class ScanRecorder:
+    def __init__(self, db_path, capacity=CAPACITY, flush_every=FLUSH_EVERY, background=True):
+        self.db_path     = db_path              # callable: the path can move (Vercel /tmp)
+        self.flush_every = flush_every
+        self.background  = background
+        self.written     = 0
+        self.dropped     = 0
+        self._buf        = deque(maxlen=capacity)
+        self._lock       = threading.Lock()     # one flush at a time
+        self._wake       = threading.Event()
+        self._thread     = None
+        self._last_flush = time.monotonic()
+
+    def record(self, asset_id, ip='', user_agent=''):
+        if len(self._buf) == self._buf.maxlen:
+            self.dropped += 1                   # deque drops the oldest
+        self._buf.append((asset_id, time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime()),
+                          ip or '', (user_agent or '')[:300]))
+        if self.background:
+            if self._thread is None:
+                self._start()
+            if len(self._buf) >= BATCH:
+                self._wake.set()
+        elif len(self._buf) >= BATCH or time.monotonic() - self._last_flush >= self.flush_every:
+            self.flush()                        # no thread (Vercel): flush from the request
+
+    def pending(self):
+        return len(self._buf)
+
+    def flush(self):
+        """Write everything buffered so far. Returns the number of scans written."""
+        with self._lock:
+            rows = []
+            while self._buf:
+                rows.append(self._buf.popleft())
+            self._last_flush = time.monotonic()
+            if not rows:
+                return 0
+            try:
+                db = dbpool.connect(self.db_path())
+                try:
+                    with db:
+                        db.executemany(_INSERT, rows)
+                finally:
+                    db.close()
+            except sqlite3.Error:
+                # Put them back in front of newer scans; retried on the next flush
+                room = self._buf.maxlen - len(self._buf)
+                self.dropped += max(0, len(rows) - room)
+                self._buf.extendleft(reversed(rows[-room:] if room else []))
+                return 0
+            self.written += len(rows)
+            return len(rows)
+
+    def stats(self):
+        return {'pending': len(self._buf), 'written': self.written, 'dropped': self.dropped}
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='assetqr-scans', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_every)
+            self._wake.clear()
+            self.flush()
+
+
+# ── Queries ───────────────────────────────────────────────────────────────────
+
+def history(db, asset_id, before=None, limit=50):
+    """Newest-first scans of one asset; pass the last id back as before."""
+    sql, args = 'SELECT id, ts, ip, user_agent FROM scans WHERE asset_id=?', [asset_id]
+    if before:
+        sql += ' AND id < ?'; args.append(before)
+    return db.execute(sql + ' ORDER BY id DESC LIMIT ?', args + [limit]).fetchall()
+
+
+def daily_counts(db, asset_id=None, days=30):
+    """Scans per asset per day (UTC) over the last `days` days, newest first."""
+    since = time.strftime('%Y-%m-%d', time.gmtime(time.time() - (days - 1) * 86400))
+    sql, args = ('SELECT asset_id, substr(ts, 1, 10) AS day, COUNT(*) AS scans '
+                 'FROM scans WHERE ts >= ?'), [since]
+    if asset_id is not None:
+        sql += ' AND asset_id=?'; args.append(asset_id)
+    return db.execute(sql + ' GROUP BY asset_id, day ORDER BY day DESC, scans DESC, asset_id',
+                      args).fetchall()
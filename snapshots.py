@@ -0,0 +1,144 @@
+"""
+Point-in-time register snapshots for audits.
+
+A snapshot is a full copy of the database taken with SQLite's online
+backup API, STEP_PAGES pages at a time, all from one WAL read snapshot,
+so live writers carry on while it is copied. Snapshot files live in SNAPSHOT_DIR (default: snapshots/
+next to the database; on Vercel that is /tmp and does not survive a cold
+start) and are listed in the live database's `snapshots` table.
+
+Snapshots are opened read-only and immutable — no locks, no journal —
+so diffs and exports against one never block the live register.
+
+    snap = create(db, db_path, '31.08.2025 audit')
+    diff(db_path, path_of(db_path, snap))   # what moved since then
+"""
+import os
+import sqlite3
+import time
+from urllib.parse import quote
+
+from importer import DATA_COLS, slugify
+
+STEP_PAGES = int(os.environ.get('SNAPSHOT_STEP_PAGES', 1024))
+
+SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS snapshots (
+        id          INTEGER PRIMARY KEY AUTOINCREMENT,
+        name        TEXT    NOT NULL,
+        file        TEXT    NOT NULL,
+        assets      INTEGER DEFAULT 0,
+        bytes       INTEGER DEFAULT 0,
+        created_at  TEXT    DEFAULT (datetime('now'))
+    );
+'''
+
+
+def init_snapshots(db):
+    db.executescript(SCHEMA)
+
+
+def folder(db_path):
+    return os.environ.get('SNAPSHOT_DIR') or os.path.join(os.path.dirname(os.path.abspath(db_path)),
+                                                          'snapshots')
+
+
+def path_of(db_path, snap):
+    return os.path.join(folder(db_path), snap['file'])
+
+
+def _uri(path):
+    return f'file:{quote(os.path.abspath(path))}?mode=ro&immutable=1'
+
+
+def open_snapshot(path):
+    """Read-only connection to a snapshot file (None if it is gone)."""
+    if not os.path.exists(path):
+        return None
+    db = sqlite3.connect(_uri(path), uri=True, check_same_thread=False)
+    db.row_factory = sqlite3.Row
+    return db
+
+
+# ── Store / list ──────────────────────────────────────────────────────────────
+
+def create(db, db_path, name):
+    """Snapshot the database at db_path and record it in db. Returns the row."""
+    d = folder(db_path)
+    os.makedirs(d, exist_ok=True)
+    stem  = f'{time.strftime("%Y%m%d-%H%M%S")}-{slugify(name) or "snapshot"}'
+    fname, n = f'{stem}.db', 1
+    while os.path.exists(os.path.join(d, fname)):
+        n += 1; fname = f'{stem}-{n}.db'
+    part  = os.path.join(d, fname + '.part')
+    src, dest = sqlite3.connect(db_path), sqlite3.connect(part)
+    try:
+        # Pin one read snapshot for every step: otherwise each write from
+        # another connection restarts the copy, and a busy register never
+        # finishes. Under WAL the open read does not hold writers up.
+        src.execute('BEGIN')
+        src.execute('SELECT COUNT(*) FROM sqlite_master').fetchone()
+        src.backup(dest, pages=STEP_PAGES)
+        src.rollback()
+        dest.execute('PRAGMA journal_mode=DELETE')     # one self-contained file
+        assets = dest.execute('SELECT COUNT(*) FROM assets').fetchone()[0]
+    finally:
+        dest.close()
+        src.close()
+    os.replace(part, os.path.join(d, fname))
+    cur = db.execute('INSERT INTO snapshots (name, file, assets, bytes) VALUES (?, ?, ?, ?)',
+                     (name, fname, assets, os.path.getsize(os.path.join(d, fname))))
+    db.commit()
+    return get(db, cur.lastrowid)
+
+
+def get(db, snap_id):
+    return db.execute('SELECT * FROM snapshots WHERE id=?', (snap_id,)).fetchone()
+
+
+def all_snapshots(db):
+    return db.execute('SELECT * FROM snapshots ORDER BY id DESC').fetchall()
+
+
+def delete(db, db_path, snap_id):
+    snap = get(db, snap_id)
+    if not snap:
+        return False
+    try:
+        os.remove(path_of(db_path, snap))
+    except FileNotFoundError:
+        pass
+    db.execute('DELETE FROM snapshots WHERE id=?', (snap_id,))
+    db.commit()
+    return True
+
+
+# ── Diff ──────────────────────────────────────────────────────────────────────
+
+def diff(db_path, snap_path):
+    """Assets added, removed and changed in the live register since the
+    snapshot. changed[i]['changes'] is {column: [then, now]}, as in the
+    asset history."""
+    db = sqlite3.connect(f'file:{quote(os.path.abspath(db_path))}?mode=ro', uri=True)
+    db.row_factory = sqlite3.Row
+    try:
+        db.execute('ATTACH DATABASE ? AS snap', (_uri(snap_path),))
+        # A snapshot older than a column added later simply lacks it
+        have = {r['name'] for r in db.execute('PRAGMA snap.table_info(assets)')}
+        cols = [c for c in DATA_COLS if c in have]
+        gone = ('SELECT x.asset_id, x.name FROM {0}.assets x WHERE NOT EXISTS '
+                '(SELECT 1 FROM {1}.assets y WHERE y.asset_id = x.asset_id) ORDER BY x.asset_id')
+        added   = [dict(r) for r in db.execute(gone.format('main', 'snap'))]
+        removed = [dict(r) for r in db.execute(gone.format('snap', 'main'))]
+        changed = []
+        sql = (f'SELECT a.asset_id, a.name AS cur_name, '
+               f'{", ".join(f"s.{c} AS s_{c}, a.{c} AS a_{c}" for c in cols)} '
+               f'FROM main.assets a JOIN snap.assets s ON s.asset_id = a.asset_id '
+               f'WHERE {" OR ".join(f"a.{c} IS NOT s.{c}" for c in cols)} ORDER BY a.asset_id')
+        for r in db.execute(sql):
+            changed.append({'asset_id': r['asset_id'], 'name': r['cur_name'],
+                            'changes': {c: [r[f's_{c}'], r[f'a_{c}']] for c in cols
+                                        if r[f's_{c}'] != r[f'a_{c}']}})
+    finally:
+        db.close()
+    return {'added': added, 'removed': removed, 'changed': changed}
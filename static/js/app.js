@@ -141,7 +141,7 @@ async function confirmDelete() {
       // Remove row from table without full reload
       const row = document.querySelector(`tr[data-id="${_deleteId}"]`);
       if (row) row.remove();
-      updateCountLabel();
+      updateCountLabel(1);
     } else {
       toast(data.error || 'Delete failed', 'error');
     }
@@ -153,10 +153,13 @@ async function confirmDelete() {
   }
 }
 
-function updateCountLabel() {
+function updateCountLabel(removed = 0) {
+  // The table shows one page; the label carries the total across pages.
   const lbl  = document.getElementById('asset-count');
-  const rows = document.querySelectorAll('#asset-table tbody tr').length;
-  if (lbl) lbl.textContent = `${rows} asset${rows !== 1 ? 's' : ''}`;
+  if (!lbl) return;
+  const rows = Math.max(0, Number(lbl.dataset.total || 0) - removed);
+  lbl.dataset.total = rows;
+  lbl.textContent = `${rows} asset${rows !== 1 ? 's' : ''}`;
 }
 
 /* ── QR Preview ───────────────────────────────────────────────────────────── */
@@ -227,24 +230,48 @@ function exportAction(type, selectedOnly) {
   if (m) m.classList.remove('open');
 }
 
-/* ── Bulk delete ──────────────────────────────────────────────────────────── */
+/* ── Bulk delete / status ────────────────────────────────────────────────── */
+async function bulkRequest(action, body) {
+  const res = await fetch(`/api/assets/${action}`, {
+    method: 'POST', headers: {'Content-Type':'application/json'}, body: JSON.stringify(body)
+  });
+  const d = await res.json();
+  if (!res.ok) throw new Error(d.error || res.statusText);
+  return d;
+}
+
 async function bulkDelete() {
   const ids = getSelectedIds();
   if (!ids.length) return;
   if (!confirm(`Delete ${ids.length} selected asset(s)? This cannot be undone.`)) return;
-  let ok = 0;
-  for (const id of ids) {
-    const res = await fetch(`/api/assets/${id}`, { method: 'DELETE' });
-    const d   = await res.json();
-    if (d.success) {
+  try {
+    const d = await bulkRequest('bulk-delete', { ids });
+    ids.forEach(id => {
       const row = document.querySelector(`tr[data-id="${id}"]`);
       if (row) row.remove();
-      ok++;
-    }
+    });
+    toast(`${d.deleted} asset${d.deleted!==1?'s':''} deleted`);
+    updateBulkBar();
+    updateCountLabel(d.deleted);
+  } catch(e) {
+    toast('Delete failed: ' + e.message, 'error');
+  }
+}
+
+async function bulkStatus(sel) {
+  const ids = getSelectedIds(), status = sel.value;
+  sel.value = '';
+  if (!ids.length || !status) return;
+  try {
+    const d = await bulkRequest('bulk-update', { ids, set: { status } });
+    ids.forEach(id => {
+      const badge = document.querySelector(`tr[data-id="${id}"] .badge`);
+      if (badge) { badge.className = `badge badge--${status}`; badge.textContent = status; }
+    });
+    toast(`${d.updated} asset${d.updated!==1?'s':''} set to ${status}`);
+  } catch(e) {
+    toast('Update failed: ' + e.message, 'error');
   }
-  toast(`${ok} asset${ok!==1?'s':''} deleted`);
-  updateBulkBar();
-  updateCountLabel();
 }
 
 /* ── Keyboard shortcuts ───────────────────────────────────────────────────── */
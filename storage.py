@@ -0,0 +1,115 @@
+"""
+Storage backends — where an app's SQLite database lives.
+
+    FileStorage(path)               a database file (the default)
+    MemoryStorage()                 a private in-memory database, for tests and benches
+    ReplicaStorage(path, replica)   writes go to path; reads that may lag go to a
+                                    read-only replica file kept in sync outside the
+                                    app (Litestream, LiteFS, a periodic copy)
+
+Each hands out pooled connections (see dbpool): acquire()/release() for
+the primary, acquire_read()/release_read() for reads that tolerate lag.
+open_storage() picks the backend for an ASSETQR_DB / ASSETQR_DB_REPLICA pair.
+
+A storage also carries what the app caches about its database (the
+settings table, whether migrations have run), so two apps in one process
+— two tests, say — never see each other's data.
+"""
+import itertools
+import os
+import shutil
+import threading
+from urllib.parse import quote
+
+import dbpool
+from dbpool import ConnectionPool, pool_for
+
+MEMORY = ':memory:'
+
+
+class FileStorage:
+    kind = 'file'
+
+    def __init__(self, path, seed=None):
+        self.path      = path
+        self.seed      = seed           # copied to path on first use if path is missing
+        self.pool      = pool_for(path)
+        self.read_pool = self.pool
+        self.migrated  = False
+        self.settings  = (None, {})     # (settings_version, {key: value})
+        self._seeded   = seed is None
+        self._lock     = threading.Lock()
+
+    def ensure(self):
+        """The database path, once the seed copy (if any) is in place."""
+        if not self._seeded:
+            with self._lock:
+                if not os.path.exists(self.path) and os.path.exists(self.seed):
+                    # Copy beside the target, then rename: a concurrent
+                    # reader sees no file or the whole database, never half
+                    part = f'{self.path}.{os.getpid()}.part'
+                    shutil.copy2(self.seed, part)
+                    os.replace(part, self.path)
+                self._seeded = True
+        return self.path
+
+    def acquire(self):
+        self.ensure()
+        return self.pool.acquire()
+
+    def release(self, db):
+        self.pool.release(db)
+
+    def acquire_read(self):
+        return self.acquire()
+
+    def release_read(self, db):
+        self.release(db)
+
+    def close(self):
+        self.pool.close()
+
+
+class MemoryStorage(FileStorage):
+    """Shared-cache in-memory database; it lives as long as this object."""
+    kind   = 'memory'
+    _names = itertools.count(1)
+
+    def __init__(self, name=None):
+        path = f'file:{name or f"assetqr-{os.getpid()}-{next(self._names)}"}?mode=memory&cache=shared'
+        super().__init__(path)
+        self.pool = self.read_pool = ConnectionPool(path)    # not the process-wide registry
+        self._anchor = dbpool.connect(path)                  # keeps the database alive
+
+    def close(self):
+        super().close()
+        self._anchor.close()
+
+
+class ReplicaStorage(FileStorage):
+    kind = 'replica'
+
+    def __init__(self, path, replica, seed=None):
+        super().__init__(path, seed)
+        self.replica   = replica
+        self.read_pool = pool_for(f'file:{quote(os.path.abspath(replica))}?mode=ro')
+
+    def acquire_read(self):
+        return self.read_pool.acquire()
+
+    def release_read(self, db):
+        self.read_pool.release(db)
+
+    def close(self):
+        super().close()
+        self.read_pool.close()
+
+
+def open_storage(database, replica=None, seed=None):
+    """Backend for an ASSETQR_DB setting: a file path or ':memory:', plus an
+    optional read replica path."""
+    if database == MEMORY:
+        return MemoryStorage()
+    if replica:
+        return ReplicaStorage(database, replica, seed)
+    return FileStorage(database, seed)
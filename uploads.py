@@ -0,0 +1,187 @@
+"""
+Streaming register uploads — turns an uploaded CSV/TXT or XLSX file into
+asset dicts one row at a time, so any file size imports in bounded memory.
+
+Header detection and column naming follow parseText()/parseCSV() on the
+import page: a first line mentioning a known column is a header row,
+otherwise every non-blank line is an asset name.
+
+XLSX is read with the standard library only (zipfile + iterparse over the
+first worksheet); there is no openpyxl dependency.
+"""
+import csv
+import io
+import itertools
+import re
+import zipfile
+from datetime import date, timedelta
+from xml.etree.ElementTree import ParseError, iterparse
+
+KNOWN_HEADERS = ('name', 'asset_id', 'category', 'location', 'serial_number', 'serial',
+                 'description', 'status', 'notes')
+
+_NS    = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+_R_ID  = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}id'
+_RELNS = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+_EPOCH = date(1899, 12, 30)                 # Excel serial day 0
+
+
+class UploadError(Exception):
+    """The file's contents are not a readable register (bad XLSX cell data,
+    missing parts)."""
+
+
+# What a malformed upload raises while being read. Only the readers' own
+# errors: a bug in whatever consumes the rows is not the file's fault.
+READ_ERRORS = (UploadError, zipfile.BadZipFile, ParseError, csv.Error, UnicodeDecodeError)
+
+
+def is_header(line):
+    first = line.lower().replace('|', ',')
+    return any(h in first for h in KNOWN_HEADERS)
+
+
+def header_key(h):
+    return re.sub(r'serial$', 'serial_number', re.sub(r'\s+', '_', h.strip().lower()))
+
+
+def is_xlsx(filename, head):
+    return filename.lower().endswith('.xlsx') or head.startswith(b'PK\x03\x04')
+
+
+def iter_items(fileobj, filename=''):
+    """Yield asset dicts from an uploaded file (binary file object). A file
+    that cannot be read raises one of READ_ERRORS."""
+    head = fileobj.read(4)
+    fileobj.seek(0)
+    if is_xlsx(filename, head):
+        return _checked(_table_items(xlsx_rows(fileobj), excel_dates=True))
+    return _checked(_text_items(io.TextIOWrapper(fileobj, encoding='utf-8-sig', errors='replace',
+                                                 newline='')))
+
+
+def _checked(items):
+    # Malformed cell data surfaces as KeyError/ValueError/IndexError inside
+    # the readers. Raised here, in the generator's own frame, they are the
+    # file's fault; the consumer's exceptions never pass through this frame.
+    try:
+        yield from items
+    except (KeyError, ValueError, IndexError) as ex:
+        if isinstance(ex, UnicodeDecodeError):
+            raise
+        raise UploadError(f'{type(ex).__name__}: {ex}') from ex
+
+
+# ── CSV / plain text ──────────────────────────────────────────────────────────
+
+def _text_items(text):
+    lines = (ln.strip() for ln in text)
+    lines = (ln for ln in lines if ln)
+    first = next(lines, None)
+    if first is None:
+        return
+    if not is_header(first):
+        yield {'name': first}                  # simple list — just names
+        for ln in lines:
+            yield {'name': ln}
+        return
+    sep = '|' if '|' in first else ','
+    yield from _table_items(csv.reader(itertools.chain([first], lines), delimiter=sep))
+
+
+def _table_items(rows, excel_dates=False):
+    header = None
+    for cells in rows:
+        cells = [(c or '').strip() for c in cells]
+        if not any(cells):
+            continue
+        if header is None:
+            if not is_header(','.join(cells)):
+                header = False
+            else:
+                header = [header_key(h) for h in cells]
+                continue
+        if header is False:
+            yield {'name': next(c for c in cells if c)}
+            continue
+        item = {h: (cells[j] if j < len(cells) else '') for j, h in enumerate(header) if h}
+        if excel_dates and re.fullmatch(r'\d+(\.\d+)?', item.get('purchase_date', '')):
+            item['purchase_date'] = (_EPOCH + timedelta(days=int(float(item['purchase_date'])))).isoformat()
+        if item.get('name'):
+            yield item
+
+
+# ── XLSX ──────────────────────────────────────────────────────────────────────
+
+def _col(ref):
+    m = re.match(r'[A-Z]+', ref)
+    if not m:
+        raise ValueError(f'bad cell reference {ref!r}')
+    n = 0
+    for ch in m.group():
+        n = n * 26 + ord(ch) - 64
+    return n - 1
+
+
+def _first_sheet(z):
+    try:
+        with z.open('xl/workbook.xml') as f:
+            rid = next(el.get(_R_ID) for _, el in iterparse(f) if el.tag == _NS + 'sheet')
+        with z.open('xl/_rels/workbook.xml.rels') as f:
+            target = next(el.get('Target') for _, el in iterparse(f)
+                          if el.tag == _RELNS + 'Relationship' and el.get('Id') == rid)
+        return target.lstrip('/') if target.startswith('/') else f'xl/{target}'
+    except (KeyError, StopIteration):
+        return 'xl/worksheets/sheet1.xml'
+
+
+def _shared_strings(z):
+    # One entry per distinct string in the workbook, not per cell.
+    try:
+        f = z.open('xl/sharedStrings.xml')
+    except KeyError:
+        return []
+    out = []
+    with f:
+        for _, el in iterparse(f):
+            if el.tag == _NS + 'si':
+                out.append(''.join(t.text or '' for t in el.iter(_NS + 't')))
+                el.clear()
+    return out
+
+
+def _cell(c, strings):
+    t = c.get('t')
+    if t == 'inlineStr':
+        return ''.join(x.text or '' for x in c.iter(_NS + 't'))
+    v = c.findtext(_NS + 'v') or ''
+    if t == 's':
+        return strings[int(v)] if v else ''
+    if t == 'b':
+        return 'TRUE' if v == '1' else 'FALSE'
+    if re.fullmatch(r'-?\d+\.0', v):
+        return v[:-2]
+    return v
+
+
+def xlsx_rows(fileobj):
+    """Yield each row of the first worksheet as a list of cell strings."""
+    with zipfile.ZipFile(fileobj) as z:
+        strings = _shared_strings(z)
+        with z.open(_first_sheet(z)) as f:
+            data = None
+            for ev, el in iterparse(f, events=('start', 'end')):
+                if ev == 'start':
+                    if el.tag == _NS + 'sheetData':
+                        data = el
+                    continue
+                if el.tag != _NS + 'row':
+                    continue
+                cells = []
+                for c in el.iter(_NS + 'c'):
+                    i = _col(c.get('r')) if c.get('r') else len(cells)
+                    cells.extend([''] * (i - len(cells)))
+                    cells.append(_cell(c, strings))
+                yield cells
+                if data is not None:
+                    data.clear()                # drop parsed rows: memory stays flat